@@ -0,0 +1,125 @@
+"""
+Benchmark admin changelist page loads on large history tables.
+
+Fetches the admin changelists (first page, filtered, keyset "Older" page)
+as a temporary superuser and reports status, query count, query time and
+total time per page. With --seed, first bulk-inserts synthetic state
+changes and hourly summaries for existing devices - only use it against a
+throwaway database.
+
+Usage (from the agent directory, with the agent's database configured):
+    python benchmarks/admin_changelist.py [--repeat 5] [--seed 1000000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from monitoring.models import Device, HourlySummary, StateChange, User  # noqa: E402
+
+BATCH = 10000
+
+
+def seed(rows):
+    devices = list(Device.objects.all())
+    if not devices:
+        sys.exit('No devices to attach synthetic history to')
+
+    now = timezone.now().replace(minute=0, second=0, microsecond=0)
+    step = timedelta(days=3 * 365) / rows
+    for start in range(0, rows, BATCH):
+        StateChange.objects.bulk_create([
+            StateChange(device=device, user_id=device.user_id,
+                        timestamp=now - step * i, status=i % 2)
+            for i in range(start, min(start + BATCH, rows))
+            for device in [random.choice(devices)]
+        ])
+
+    users = list(User.objects.values_list('id', flat=True))
+    hours = rows // len(users)
+    per_batch = max(1, BATCH // len(users))
+    for start in range(0, hours, per_batch):
+        HourlySummary.objects.bulk_create([
+            HourlySummary(user_id=user_id, hour=now - timedelta(hours=h + 1),
+                          first_seen=now - timedelta(hours=h + 1),
+                          last_seen=now - timedelta(hours=h), minutes_online=60,
+                          synced=True)
+            for h in range(start, min(start + per_batch, hours))
+            for user_id in users
+        ], ignore_conflicts=True)
+    print(f'Seeded {rows} state changes and {hours * len(users)} hourly summaries')
+
+
+def measure(client, url, repeat):
+    timings, queries, query_ms, status = [], 0, 0.0, None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - start)
+        status = response.status_code
+        queries = len(captured.captured_queries)
+        query_ms = sum(float(q['time']) for q in captured.captured_queries) * 1000
+    return status, queries, query_ms, min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0,
+                        help='insert this many synthetic state changes first')
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.seed)
+
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+    admin_user, _ = get_user_model().objects.get_or_create(
+        username='changelist-benchmark',
+        defaults={'is_staff': True, 'is_superuser': True})
+    client = Client()
+    client.force_login(admin_user)
+
+    oldest = StateChange.objects.order_by('-timestamp', '-pk').values_list(
+        'timestamp', 'pk')[100:101].first()
+    month = timezone.localtime().strftime('%Y-%m')
+    urls = [
+        '/admin/monitoring/user/',
+        '/admin/monitoring/statechange/',
+        f'/admin/monitoring/statechange/?month={month}',
+        '/admin/monitoring/statechange/?status__exact=1',
+        '/admin/monitoring/hourlysummary/',
+        f'/admin/monitoring/hourlysummary/?month={month}',
+    ]
+    if oldest:
+        urls.append('/admin/monitoring/statechange/?'
+                    + urlencode({'before': oldest[0].isoformat(), 'before_pk': oldest[1]}))
+
+    try:
+        print(f"{'page':<70} {'status':>6} {'queries':>8} {'SQL ms':>8} {'total ms':>9}")
+        for url in urls:
+            status, queries, query_ms, total_ms = measure(client, url, args.repeat)
+            print(f'{url[:70]:<70} {status:>6} {queries:>8} {query_ms:>8.1f} {total_ms:>9.1f}')
+    finally:
+        admin_user.delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Local stand-in for the cloud API, for trying out payload encodings.
+
+Accepts /api/heartbeat and /api/presence in JSON or the compact format,
+decodes them and prints the wire and decoded sizes. Unless --json-only is
+given it advertises compact support via Accept-Post / Accept-Encoding, so
+an agent pointed at it (CLOUD_API_URL=http://localhost:8080) switches to
+the compact encoding after its first request.
+
+Usage:
+    python benchmarks/cloud_stub.py [--port 8080] [--json-only]
+"""
+import argparse
+import json
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitoring import encoding  # noqa: E402
+
+
+class CloudStubHandler(BaseHTTPRequestHandler):
+    json_only = False
+
+    def do_POST(self):
+        if self.path not in ('/api/heartbeat', '/api/presence'):
+            self.send_error(404)
+            return
+
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        content_type = self.headers.get('Content-Type', '').split(';')[0]
+        coding = self.headers.get('Content-Encoding')
+
+        compact = content_type == encoding.COMPACT_MEDIA_TYPE
+        if self.json_only and (compact or coding):
+            self.send_error(415)
+            return
+
+        try:
+            raw = encoding.decompress(body, coding)
+            payload = encoding.decode_compact(raw) if compact else json.loads(raw)
+        except Exception as e:
+            self.send_error(400, str(e))
+            return
+
+        print(f"{self.path} {content_type} coding={coding or '-'} "
+              f"wire={len(body)}B decoded={len(raw)}B keys={sorted(payload)}")
+
+        self.send_response(200)
+        if not self.json_only:
+            self.send_header('Accept-Post', f'{encoding.COMPACT_MEDIA_TYPE}, '
+                                            f'{encoding.JSON_MEDIA_TYPE}')
+            self.send_header('Accept-Encoding', ', '.join(encoding.available_codings()))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--json-only', action='store_true',
+                        help='behave like a cloud without compact support')
+    args = parser.parse_args()
+
+    CloudStubHandler.json_only = args.json_only
+    server = ThreadingHTTPServer(('0.0.0.0', args.port), CloudStubHandler)
+    print(f"Cloud stub listening on :{args.port}"
+          f"{' (JSON only)' if args.json_only else ''}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark size and CPU cost of cloud payload encodings.
+
+Builds synthetic heartbeat and hourly-summary batches shaped like the
+agent's payloads and reports wire size and encode time for JSON and the
+compact format, each with and without compression.
+
+Usage:
+    python benchmarks/payload_encoding.py [--employees 50] [--rows 500]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitoring import encoding  # noqa: E402
+
+
+def heartbeat_payload(employees):
+    now = datetime.now(timezone.utc)
+    return {
+        'siteId': 'Benchmark Office',
+        'timestamp': now.isoformat(),
+        'devicesOnline': [{
+            'employeeId': i,
+            'employeeName': f'Employee {i:03d}',
+            'fakeName': f'Employee {i:03d}',
+            'area': 'default',
+            'isPresent': i % 3 != 0,
+            'lastSeen': (now - timedelta(minutes=i)).isoformat(),
+        } for i in range(employees)],
+    }
+
+
+def presence_payload(rows, employees):
+    start = datetime(2025, 1, 6, 8, tzinfo=timezone.utc)
+    data = []
+    for i in range(rows):
+        hour = start + timedelta(hours=i // employees)
+        data.append({
+            'employeeId': i % employees,
+            'employeeName': f'Employee {i % employees:03d}',
+            'fakeName': f'Employee {i % employees:03d}',
+            'date': hour.date().isoformat(),
+            'hour': hour.hour,
+            'firstSeen': (hour + timedelta(minutes=i % 7)).time().isoformat(),
+            'lastSeen': (hour + timedelta(minutes=59)).time().isoformat(),
+            'minutesOnline': 52 + i % 7,
+        })
+    return {
+        'siteId': 'Benchmark Office',
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'presenceData': data,
+    }
+
+
+def measure(encode, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = encode()
+    return len(body), (time.perf_counter() - start) / repeat
+
+
+def variants(payload, compact):
+    yield 'json', lambda: encoding.encode_json(payload)
+    if encoding.msgpack is not None:
+        yield 'compact', lambda: encoding.encode_compact(compact(payload))
+    for coding in encoding.available_codings():
+        yield f'json+{coding}', lambda c=coding: encoding.compress(
+            encoding.encode_json(payload), c)
+        if encoding.msgpack is not None:
+            yield f'compact+{coding}', lambda c=coding: encoding.compress(
+                encoding.encode_compact(compact(payload)), c)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--employees', type=int, default=50)
+    parser.add_argument('--rows', type=int, default=500,
+                        help='hourly summary rows in the batch')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    cases = [
+        (f'heartbeat ({args.employees} employees)',
+         heartbeat_payload(args.employees), encoding.compact_heartbeat),
+        (f'presence ({args.rows} rows)',
+         presence_payload(args.rows, args.employees), encoding.compact_presence),
+    ]
+
+    for title, payload, compact in cases:
+        print(title)
+        baseline = None
+        for name, encode in variants(payload, compact):
+            size, seconds = measure(encode, args.repeat)
+            baseline = baseline or size
+            print(f'  {name:<14} {size:>8} B  {size / baseline:>6.1%}  '
+                  f'{seconds * 1e6:>8.0f} us')
+        print()
+
+
+if __name__ == '__main__':
+    main()
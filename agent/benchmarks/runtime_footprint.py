@@ -0,0 +1,128 @@
+"""
+Benchmark startup time and memory of the two agent runtimes.
+
+Starts each runtime from the agent directory, waits for the first
+completed scan and reports time-to-first-scan and the total RSS of the
+runtime's process tree after it has settled.
+
+Usage (inside the agent container, with Postgres and Redis running and
+nothing else scanning):
+    python benchmarks/runtime_footprint.py [--settle 20] [--modes celery asyncio]
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AGENT_DIR)
+
+# Queue names only; importing monitoring.schedule needs no Django setup
+from monitoring.schedule import (  # noqa: E402
+    QUEUE_CLOUD, QUEUE_HOUSEKEEPING, QUEUE_SCAN, QUEUE_SYNC)
+
+MODES = {
+    # One worker per queue with entrypoint.sh's default concurrency
+    'celery': [
+        ['celery', '-A', 'config', 'worker', '-l', 'warning', '-n', f'{queue}@%h',
+         '-Q', queue, '--concurrency', concurrency, '--prefetch-multiplier', '1']
+        for queue, concurrency in ((QUEUE_SCAN, '2'), (QUEUE_CLOUD, '1'),
+                                   (QUEUE_SYNC, '1'), (QUEUE_HOUSEKEEPING, '1'))
+    ] + [
+        ['celery', '-A', 'config', 'beat', '-l', 'warning'],
+    ],
+    'asyncio': [
+        [sys.executable, 'manage.py', 'run_agent'],
+    ],
+}
+
+FIRST_SCAN_MARKER = 'Scan complete'
+
+
+def descendants(root_pids):
+    """All pids in the process trees of root_pids."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids, stack = set(), list(root_pids)
+    while stack:
+        pid = stack.pop()
+        if pid not in pids:
+            pids.add(pid)
+            stack.extend(children.get(pid, []))
+    return pids
+
+
+def rss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def run_mode(mode, settle, timeout):
+    first_scan = threading.Event()
+    start = time.monotonic()
+    first_scan_at = [None]
+
+    def watch(stream):
+        for line in stream:
+            if FIRST_SCAN_MARKER in line and not first_scan.is_set():
+                first_scan_at[0] = time.monotonic() - start
+                first_scan.set()
+
+    processes = []
+    for command in MODES[mode]:
+        process = subprocess.Popen(
+            command, cwd=AGENT_DIR, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, text=True, start_new_session=True)
+        threading.Thread(target=watch, args=(process.stdout,), daemon=True).start()
+        processes.append(process)
+
+    try:
+        first_scan.wait(timeout)
+        time.sleep(settle)
+        pids = descendants(p.pid for p in processes)
+        total_rss = sum(rss_kb(pid) for pid in pids)
+    finally:
+        for process in processes:
+            os.killpg(process.pid, signal.SIGTERM)
+        for process in processes:
+            process.wait(timeout=30)
+
+    return first_scan_at[0], len(pids), total_rss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=MODES)
+    parser.add_argument('--settle', type=float, default=20,
+                        help='seconds to wait after the first scan before measuring RSS')
+    parser.add_argument('--timeout', type=float, default=120,
+                        help='max seconds to wait for the first scan')
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'first scan':>12} {'processes':>10} {'RSS':>10}")
+    for mode in args.modes:
+        first_scan, processes, total_rss = run_mode(mode, args.settle, args.timeout)
+        first = f'{first_scan:.2f}s' if first_scan is not None else 'timeout'
+        print(f'{mode:<10} {first:>12} {processes:>10} {total_rss / 1024:>8.1f}MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmark the server (Postgres + Redis) and embedded (SQLite WAL) storage modes.
+
+Runs each mode in a child process with STORAGE_MODE set, on a throwaway
+database (a Postgres test database, or a temporary SQLite file), seeds
+synthetic users and devices, and times ping_all_devices and
+send_hourly_summary_to_cloud. arp-scan and the cloud API are replaced
+by in-process stand-ins so only the storage work is measured. Reports
+latency per task and RSS of the agent process plus, when visible in
+/proc, of the postgres and redis-server processes.
+
+Usage (from the agent directory; server mode needs Postgres and Redis):
+    python benchmarks/storage_modes.py [--users 50] [--repeat 20] [--modes server embedded]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AGENT_DIR)
+
+MODES = ['server', 'embedded']
+SERVICE_PROCESSES = ('postgres', 'redis-server')
+
+
+def service_rss_kb():
+    """Total VmRSS of database and cache server processes visible in /proc."""
+    total = 0
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/comm') as f:
+                name = f.read().strip()
+            if name not in SERVICE_PROCESSES:
+                continue
+            with open(f'/proc/{entry}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def run_child(mode, users, repeat):
+    """Benchmark body, run with STORAGE_MODE already set for this process."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+
+    django.setup()
+
+    import ipaddress
+    from unittest import mock
+
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connection
+    from django.utils import timezone
+
+    from monitoring import constants, tasks
+    from monitoring.models import Device, StateChange, User
+    from monitoring.scanner import ScanResult, get_shards
+
+    # Keep the benchmark's locks and caches apart from a running agent
+    settings.CACHES['default']['KEY_PREFIX'] = 'storage-benchmark'
+
+    if mode == 'embedded':
+        call_command('migrate', verbosity=0)
+        call_command('createcachetable', verbosity=0)
+    else:
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+    try:
+        network = ipaddress.ip_network(settings.SUBNET.split(',')[0].strip())
+        addresses = list(network.hosts())[:users]
+        now = timezone.now()
+        for i, address in enumerate(addresses):
+            user = User.objects.create(
+                employee_name=f'benchmark-{i}', fake_name=f'B{i}', display_order=i)
+            device = Device.objects.create(
+                user=user, ip_address=str(address),
+                mac_address=f'02:00:00:00:{i // 256:02x}:{i % 256:02x}')
+            StateChange.objects.create(
+                user=user, device=device, status=i % 2,
+                timestamp=now - timedelta(minutes=90))
+
+        shards = get_shards()
+        macs = list(Device.objects.values_list('mac_address', flat=True))
+
+        def fake_scan(mac_devices, hosts=None, shards=None):
+            # A different half of the devices answers every scan, so each
+            # run writes state changes
+            return ScanResult(macs=set(random.sample(macs, len(macs) // 2)),
+                              scanned=list(shards or get_shards()))
+
+        with mock.patch.object(tasks, 'get_online_devices', fake_scan), \
+                mock.patch.object(tasks, 'task_dispatcher', lambda task: task()), \
+                mock.patch.object(tasks, 'send_heartbeat', return_value=True), \
+                mock.patch.object(tasks, 'send_hourly_summary', return_value=True), \
+                mock.patch.object(constants, 'CONFIRM_PROBES_ENABLED', False), \
+                mock.patch('builtins.print'):
+            ping = timed(tasks.ping_all_devices, repeat)
+            summary = timed(tasks.send_hourly_summary_to_cloud, repeat)
+
+        result = {
+            'devices': len(addresses),
+            'shards': len(shards),
+            'ping': ping,
+            'summary': summary,
+            'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'service_rss_kb': service_rss_kb() if mode == 'server' else 0,
+        }
+    finally:
+        if mode == 'server':
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print(json.dumps(result))
+
+
+def run_mode(mode, users, repeat):
+    env = dict(os.environ, STORAGE_MODE=mode)
+    with tempfile.TemporaryDirectory() as directory:
+        if mode == 'embedded':
+            env['SQLITE_PATH'] = os.path.join(directory, 'agent.sqlite3')
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', mode,
+             '--users', str(users), '--repeat', str(repeat)],
+            cwd=AGENT_DIR, env=env, capture_output=True, text=True)
+    if output.returncode != 0:
+        sys.exit(f'{mode} benchmark failed:\n{output.stderr}')
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.users, args.repeat)
+        return
+
+    print(f"{'mode':<10} {'devices':>8} {'ping p50/max ms':>18} "
+          f"{'summary p50/max ms':>20} {'agent RSS':>10} {'services RSS':>13}")
+    for mode in args.modes:
+        result = run_mode(mode, args.users, args.repeat)
+        ping = '{:.1f}/{:.1f}'.format(*result['ping'])
+        summary = '{:.1f}/{:.1f}'.format(*result['summary'])
+        services = (f"{result['service_rss_kb'] / 1024:.1f}MB"
+                    if result['service_rss_kb'] else '-')
+        print(f"{mode:<10} {result['devices']:>8} {ping:>18} {summary:>20} "
+              f"{result['rss_kb'] / 1024:>8.1f}MB {services:>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,23 @@
 """
-This will make sure the app is always imported when Django starts
-so that shared_task will use this app.
+With the Celery runtime the app is imported when Django starts, so
+shared_task (and .delay() from any process: web, shell, workers) uses
+this app and its broker.
+
+The asyncio runtime (AGENT_RUNTIME=asyncio) has no broker and skips the
+import cost; it runs tasks started from other tasks through
+monitoring.tasks.dispatch(), the only supported way to start a task in
+the background. `celery -A config` still finds the app lazily.
 """
-from .celery import app as celery_app
+import os
+
+if os.getenv('AGENT_RUNTIME', 'celery') == 'celery':
+    from .celery import app as celery_app
+else:
+    def __getattr__(name):
+        if name == 'celery_app':
+            from .celery import app
+            return app
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ('celery_app',)
@@ -4,7 +4,8 @@ Celery configuration for agent project.
 import os
 from celery import Celery
 from celery.schedules import crontab
-from monitoring import constants
+from monitoring.schedule import (
+    PERIODIC_TASKS, HOURLY, TASK_QUEUES, QUEUE_TIME_LIMITS, QUEUE_HOUSEKEEPING)
 
 # Set Django settings module
 os.environ['DJANGO_SETTINGS_MODULE'] = 'config.settings'
@@ -17,30 +18,34 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Auto-discover tasks from all registered Django apps
 app.autodiscover_tasks()
 
-# Configure periodic tasks
+# Configure periodic tasks (shared with the asyncio runtime)
+# Interval tasks expire after one interval, so a backed-up queue drops
+# stale runs instead of replaying them and keeps the scan cadence
 app.conf.beat_schedule = {
-    'ping-devices': {
-        'task': 'monitoring.tasks.ping_all_devices',
-        'schedule': constants.PING_INTERVAL_SECONDS,
-    },
-    'send-heartbeat': {
-        'task': 'monitoring.tasks.send_heartbeat_to_cloud',
-        'schedule': 300.0,  # Every 5 minutes
-    },
-    'send-hourly-summary': {
-        'task': 'monitoring.tasks.send_hourly_summary_to_cloud',
-        'schedule': crontab(minute=0),  # Every hour at :00
-    },
-    'update-system-heartbeat': {
-        'task': 'monitoring.tasks.update_system_heartbeat',
-        'schedule': 30.0,  # Every 30 seconds
-    },
-    'retry-unsynced-summaries': {
-        'task': 'monitoring.tasks.retry_unsynced_summaries',
-                'schedule': 900.0,  # 900s = 15 minutes
-    },
+    name: {
+        'task': task,
+        'schedule': crontab(minute=0) if interval == HOURLY else float(interval),
+        'options': {} if interval == HOURLY else {'expires': float(interval)},
+    }
+    for name, (task, interval) in PERIODIC_TASKS.items()
 }
 
+# Dedicated queues with their own workers and time limits
+app.conf.task_default_queue = QUEUE_HOUSEKEEPING
+app.conf.task_routes = {task: {'queue': queue} for task, queue in TASK_QUEUES.items()}
+app.conf.task_annotations = {
+    task: {
+        'time_limit': QUEUE_TIME_LIMITS[queue],
+        'soft_time_limit': QUEUE_TIME_LIMITS[queue] - 10,
+    }
+    for task, queue in TASK_QUEUES.items()
+}
+# Don't let a busy worker hold tasks another one could start
+app.conf.worker_prefetch_multiplier = 1
+
+# Queue wait time metrics (publish -> start)
+import monitoring.queue_metrics  # noqa: E402,F401
+
 # Simplify log format - remove worker names and log levels
 app.conf.worker_log_format = '%(asctime)s: %(message)s'
 app.conf.worker_task_log_format = '%(asctime)s: %(message)s'
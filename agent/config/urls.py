@@ -2,9 +2,9 @@
 URL configuration for agent project.
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    # Add more endpoints here if needed later
+    path('api/', include('monitoring.urls')),
 ]
@@ -1,23 +1,47 @@
 #!/bin/bash
 set -e
 
-echo "Waiting for postgres..."
-while ! pg_isready -h localhost -p 5432 -U postgres; do
-  sleep 1
-done
-echo "PostgreSQL started"
+AGENT_STARTED_AT=$(date +%s.%N)
 
-echo "Running migrations..."
-python manage.py migrate
+if [ "${STORAGE_MODE:-server}" = "embedded" ]; then
+  # SQLite file + database cache, no Postgres/Redis/Celery broker
+  mkdir -p "$(dirname "${SQLITE_PATH:-data/agent.sqlite3}")"
+  export AGENT_RUNTIME=asyncio
+else
+  echo "Waiting for postgres..."
+  while ! pg_isready -q -h localhost -p 5432 -U postgres; do
+    sleep 0.2
+  done
+  echo "PostgreSQL started"
+fi
 
-echo "Checking for power outage..."
-python manage.py check_outage || true
+if [ "${AGENT_RUNTIME:-celery}" = "asyncio" ]; then
+  echo "Starting single-process asyncio runtime..."
+  exec python manage.py run_agent --boot --started-at "$AGENT_STARTED_AT" \
+    --http 0.0.0.0:8000
+fi
 
-echo "Starting Celery worker in background..."
-celery -A config worker -l warning &
+echo "Booting agent (migrations, outage check, caches)..."
+python manage.py boot --started-at "$AGENT_STARTED_AT"
+
+# One worker per queue (see monitoring/schedule.py) so cloud uploads
+# never hold up scans
+echo "Starting Celery workers in background..."
+celery -A config worker -l warning -n scan@%h -Q scan \
+  --concurrency "${SCAN_WORKER_CONCURRENCY:-2}" --prefetch-multiplier 1 &
+celery -A config worker -l warning -n cloud@%h -Q cloud \
+  --concurrency 1 --prefetch-multiplier 1 &
+celery -A config worker -l warning -n sync@%h -Q sync \
+  --concurrency "${SYNC_WORKER_CONCURRENCY:-1}" --prefetch-multiplier 1 &
+celery -A config worker -l warning -n housekeeping@%h -Q housekeeping \
+  --concurrency 1 --prefetch-multiplier 1 &
 
 echo "Starting Celery beat in background..."
 celery -A config beat -l warning &
 
-echo "Starting Django development server..."
-python manage.py runserver 0.0.0.0:8000 --verbosity 2
+echo "Starting gunicorn..."
+exec gunicorn config.asgi:application \
+  --worker-class uvicorn.workers.UvicornWorker \
+  --bind 0.0.0.0:8000 \
+  --workers "${WEB_WORKERS:-2}" \
+  --access-logfile -
@@ -2,20 +2,44 @@
 Django Admin configuration for monitoring app.
 """
 from django.contrib import admin
-from .models import User, Device, StateChange, HourlySummary, SystemStatus, AgentDowntime
+from django.db.models import OuterRef, Subquery
+from .changelist import CachedMonthFilter, KeysetPaginationMixin
+from .models import Site, User, Device, StateChange, HourlySummary, SystemStatus, AgentDowntime
+
+
+class TimestampMonthFilter(CachedMonthFilter):
+    field_name = 'timestamp'
+
+
+class HourMonthFilter(CachedMonthFilter):
+    field_name = 'hour'
+
+
+@admin.register(Site)
+class SiteAdmin(admin.ModelAdmin):
+    list_display = ['site_id', 'subnet', 'network_interface', 'created_at']
+    search_fields = ['site_id']
 
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ['employee_name', 'fake_name',
+    list_display = ['employee_name', 'fake_name', 'site',
                     'display_order', 'is_online_status', 'created_at']
     list_editable = ['display_order']
+    list_filter = ['site']
+    list_select_related = ['site']
     search_fields = ['employee_name', 'fake_name']
     ordering = ['display_order']
 
+    def get_queryset(self, request):
+        latest = StateChange.objects.filter(
+            user=OuterRef('pk')).order_by('-timestamp').values('status')[:1]
+        return super().get_queryset(request).annotate(latest_status=Subquery(latest))
+
     def is_online_status(self, obj):
-        return '🟢 Online' if obj.is_online() else '🔴 Offline'
+        return '🟢 Online' if obj.latest_status == 1 else '🔴 Offline'
     is_online_status.short_description = 'Status'
+    is_online_status.admin_order_field = 'latest_status'
 
 
 @admin.register(Device)
@@ -23,14 +47,16 @@ class DeviceAdmin(admin.ModelAdmin):
     list_display = ['user', 'ip_address',
                     'mac_address', 'device_name', 'created_at']
     list_filter = ['user']
+    list_select_related = ['user']
     search_fields = ['ip_address', 'mac_address', 'user__employee_name']
 
 
 @admin.register(StateChange)
-class StateChangeAdmin(admin.ModelAdmin):
+class StateChangeAdmin(KeysetPaginationMixin, admin.ModelAdmin):
     list_display = ['user', 'device', 'timestamp', 'status', 'created_at']
-    list_filter = ['status', 'user']
-    date_hierarchy = 'timestamp'
+    list_filter = [TimestampMonthFilter, 'status', 'user']
+    list_select_related = ['user', 'device__user']
+    keyset_field = 'timestamp'
     readonly_fields = ['created_at']
 
     def has_add_permission(self, request):
@@ -38,11 +64,12 @@ class StateChangeAdmin(admin.ModelAdmin):
 
 
 @admin.register(HourlySummary)
-class HourlySummaryAdmin(admin.ModelAdmin):
+class HourlySummaryAdmin(KeysetPaginationMixin, admin.ModelAdmin):
     list_display = ['user', 'hour', 'first_seen',
                     'last_seen', 'minutes_online']
-    list_filter = ['user']
-    date_hierarchy = 'hour'
+    list_filter = [HourMonthFilter, 'user']
+    list_select_related = ['user']
+    keyset_field = 'hour'
     readonly_fields = ['created_at']
 
     def has_add_permission(self, request):
@@ -0,0 +1,179 @@
+"""
+Admin changelist pieces for tables with years of history.
+
+The stock changelist counts every row twice, aggregates dates for
+date_hierarchy and pages with OFFSET, which all get slower as
+state_changes and hourly_summaries grow. These replacements keep page
+loads flat:
+
+- EstimatedCountPaginator: pg_class estimate when unfiltered, capped
+  COUNT otherwise
+- KeysetPaginationMixin: "Older" links filter on the newest-first
+  (timestamp, pk) pair instead of OFFSET pages
+- CachedMonthFilter: month choices from MIN/MAX of an indexed column,
+  cached, instead of date_hierarchy
+"""
+from datetime import datetime
+
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from . import constants
+
+
+def estimated_count(queryset):
+    """
+    Row count of an unfiltered queryset from Postgres statistics.
+
+    Returns:
+        int | None: Estimate, or None if not available or too small to trust
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+            [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+
+    # reltuples is -1 (or stale and small) until the table is analyzed
+    if row and row[0] >= constants.ADMIN_ESTIMATED_COUNT_MIN:
+        return int(row[0])
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that never runs an unbounded COUNT(*)."""
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is not None:
+            return estimate
+        # COUNT over a LIMIT subquery stops at the cap
+        return self.object_list.order_by()[:constants.ADMIN_COUNT_LIMIT].count()
+
+
+# Query string parameters of the keyset position (value and pk of the
+# last row shown)
+KEYSET_VAR = 'before'
+KEYSET_PK_VAR = 'before_pk'
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Changelist with keyset links on the model admin's keyset_field.
+
+    Rows are ordered newest first on (keyset_field, pk), so rows sharing a
+    timestamp keep a stable order and the Older link continues right after
+    the last row shown. Sets older_url and newest_url for the
+    keyset_change_list.html pagination block.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(KEYSET_VAR, None)
+        lookup_params.pop(KEYSET_PK_VAR, None)
+        return lookup_params
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        if KEYSET_VAR not in self.params:
+            return queryset
+
+        field = self.model_admin.keyset_field
+        try:
+            value = datetime.fromisoformat(self.params[KEYSET_VAR])
+            pk = int(self.params.get(KEYSET_PK_VAR, ''))
+        except ValueError as e:
+            raise IncorrectLookupParameters(e)
+        return queryset.filter(
+            Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+
+    def get_results(self, request):
+        super().get_results(request)
+        keyset_vars = [KEYSET_VAR, KEYSET_PK_VAR]
+
+        self.keyset_active = KEYSET_VAR in self.params
+        self.newest_url = self.get_query_string(remove=[*keyset_vars, PAGE_VAR])
+        self.older_url = None
+
+        # Keyset links only make sense on the default newest-first order
+        rows = list(self.result_list)
+        if ORDER_VAR in self.params or self.show_all or len(rows) < self.list_per_page:
+            return
+
+        last = rows[-1]
+        self.older_url = self.get_query_string({
+            KEYSET_VAR: getattr(last, self.model_admin.keyset_field).isoformat(),
+            KEYSET_PK_VAR: last.pk,
+        }, remove=[PAGE_VAR])
+
+
+class KeysetPaginationMixin:
+    """ModelAdmin mixin paging newest-first on (keyset_field, pk)."""
+    keyset_field = None
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/monitoring/keyset_change_list.html'
+
+    def get_ordering(self, request):
+        return [f'-{self.keyset_field}', '-pk']
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+class CachedMonthFilter(admin.SimpleListFilter):
+    """
+    Filter by local calendar month of field_name.
+
+    Choices span MIN..MAX of the column, which is index-backed, and are
+    cached for ADMIN_MONTHS_CACHE_SECONDS.
+    """
+    title = 'month'
+    parameter_name = 'month'
+    field_name = None
+
+    def lookups(self, request, model_admin):
+        model = model_admin.model
+        cache_key = f'admin_months:{model._meta.db_table}:{self.field_name}'
+        months = cache.get(cache_key)
+        if months is None:
+            bounds = model.objects.aggregate(
+                first=Min(self.field_name), last=Max(self.field_name))
+            months = []
+            if bounds['first'] is not None:
+                first = timezone.localtime(bounds['first'])
+                last = timezone.localtime(bounds['last'])
+                year, month = last.year, last.month
+                while (year, month) >= (first.year, first.month):
+                    months.append((f'{year}-{month:02d}',
+                                   datetime(year, month, 1).strftime('%B %Y')))
+                    year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+            cache.set(cache_key, months, constants.ADMIN_MONTHS_CACHE_SECONDS)
+        return months
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            start = datetime.strptime(self.value(), '%Y-%m')
+        except ValueError:
+            return queryset
+
+        end = start.replace(year=start.year + start.month // 12,
+                            month=start.month % 12 + 1)
+        return queryset.filter(**{
+            f'{self.field_name}__gte': timezone.make_aware(start),
+            f'{self.field_name}__lt': timezone.make_aware(end),
+        })
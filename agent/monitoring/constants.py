@@ -14,10 +14,146 @@ OFFLINE_THRESHOLD_SECONDS = 15          # Mark offline after X seconds
 
 PING_LOCK_TIMEOUT_SECONDS = int(os.getenv('PING_LOCK_TIMEOUT_SECONDS', 60))
 
+# Adaptive scan scheduling (see monitoring/scheduler.py)
+# When enabled, ping_all_devices runs every ADAPTIVE_SCAN_TICK_SECONDS and
+# only probes the devices that are due
+ADAPTIVE_SCAN_ENABLED = os.getenv('ADAPTIVE_SCAN_ENABLED') == 'True'
+ADAPTIVE_SCAN_TICK_SECONDS = int(os.getenv('ADAPTIVE_SCAN_TICK_SECONDS', 30))
+# Stable/night/weekend devices are probed every PING_INTERVAL_SECONDS * X
+ADAPTIVE_SLOW_FACTOR = int(os.getenv('ADAPTIVE_SLOW_FACTOR', 3))
+# Probe every tick for X seconds after a transition
+ADAPTIVE_RECENT_SECONDS = int(os.getenv('ADAPTIVE_RECENT_SECONDS', 900))
+# A device without transitions for X seconds is considered stable
+ADAPTIVE_STABLE_SECONDS = int(os.getenv('ADAPTIVE_STABLE_SECONDS', 7200))
+ADAPTIVE_NIGHT_START_HOUR = int(os.getenv('ADAPTIVE_NIGHT_START_HOUR', 21))
+ADAPTIVE_NIGHT_END_HOUR = int(os.getenv('ADAPTIVE_NIGHT_END_HOUR', 6))
+# Arrival windows: hours with at least X arrivals in the last Y days
+ADAPTIVE_ARRIVAL_MIN_COUNT = int(os.getenv('ADAPTIVE_ARRIVAL_MIN_COUNT', 2))
+ADAPTIVE_ARRIVAL_LOOKBACK_DAYS = int(os.getenv('ADAPTIVE_ARRIVAL_LOOKBACK_DAYS', 28))
+ADAPTIVE_ARRIVAL_REFRESH_SECONDS = 6 * 3600
+# Scan the whole subnet instead of single hosts above this share of due devices
+ADAPTIVE_FULL_SCAN_RATIO = float(os.getenv('ADAPTIVE_FULL_SCAN_RATIO', 0.5))
+# Scan the whole subnet at least every X seconds to find devices that got
+# a new DHCP address
+ADAPTIVE_SWEEP_SECONDS = int(os.getenv('ADAPTIVE_SWEEP_SECONDS', 600))
+
+# Presence bitmaps (see monitoring/presence.py)
+PRESENCE_BITMAP_ENABLED = os.getenv('PRESENCE_BITMAP_ENABLED', 'True') == 'True'
+# One bit per slot; changing it misreads bitmaps already stored
+PRESENCE_SLOT_SECONDS = int(os.getenv('PRESENCE_SLOT_SECONDS', PING_INTERVAL_SECONDS))
+# Devices a scan did not probe keep their last probed state this long;
+# covers the slowest adaptive interval plus a late tick
+PRESENCE_CARRY_SECONDS = int(os.getenv(
+    'PRESENCE_CARRY_SECONDS', PING_INTERVAL_SECONDS * (ADAPTIVE_SLOW_FACTOR + 1)))
+
+# Beat interval of ping_all_devices
+PING_TICK_SECONDS = (ADAPTIVE_SCAN_TICK_SECONDS if ADAPTIVE_SCAN_ENABLED
+                     else PING_INTERVAL_SECONDS)
+
+# Confirmation probes: when a scan misses every device of an online user,
+# arping those devices right away. An answer cancels the miss; no answer
+# marks the user offline after CONFIRM_OFFLINE_FAILURE_COUNT such misses
+# instead of OFFLINE_FAILURE_COUNT scan misses.
+CONFIRM_PROBES_ENABLED = os.getenv('CONFIRM_PROBES_ENABLED', 'True') == 'True'
+CONFIRM_OFFLINE_FAILURE_COUNT = int(os.getenv('CONFIRM_OFFLINE_FAILURE_COUNT', 1))
+CONFIRM_MAX_WORKERS = int(os.getenv('CONFIRM_MAX_WORKERS', 8))
+CONFIRM_PROBE_TIMEOUT_SECONDS = int(os.getenv('CONFIRM_PROBE_TIMEOUT_SECONDS', 4))
+# Bounds of one confirmation pass; devices over the cap get no probe
+CONFIRM_MAX_DEVICES = int(os.getenv('CONFIRM_MAX_DEVICES', 32))
+CONFIRM_DEADLINE_SECONDS = int(os.getenv('CONFIRM_DEADLINE_SECONDS', 15))
+
+# Sharded scanning (see monitoring/scanner.py)
+# Subnets larger than this prefix are split into sub-ranges
+SCAN_SHARD_PREFIX = int(os.getenv('SCAN_SHARD_PREFIX', 24))
+# Max shards scanned at the same time
+SCAN_MAX_WORKERS = int(os.getenv('SCAN_MAX_WORKERS', 4))
+# arp-scan timeout per shard
+SCAN_SHARD_TIMEOUT_SECONDS = int(os.getenv('SCAN_SHARD_TIMEOUT_SECONDS', 30))
+
 # Cloud communication
 HEARTBEAT_INTERVAL_MINUTES = 5          # Send "who's online" every 5 minutes
 SUMMARY_INTERVAL_HOURS = 1              # Send hourly summary every hour
+HEARTBEAT_INTERVAL_SECONDS = HEARTBEAT_INTERVAL_MINUTES * 60
+# "auto": use compact MessagePack / compression when the cloud advertises
+# it (see monitoring/encoding.py), "json": always send plain JSON
+CLOUD_PAYLOAD_ENCODING = os.getenv('CLOUD_PAYLOAD_ENCODING', 'auto')
+# Re-check advertised encodings after X seconds
+CLOUD_CAPABILITIES_TTL_SECONDS = 3600
+CLOUD_REQUEST_TIMEOUT_SECONDS = 10
+
+# Cloud circuit breaker (see services.CloudCircuitBreaker)
+# Open after X consecutive failed cloud calls
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 3))
+# Fail fast for X seconds before sending a single probe request
+BREAKER_RESET_SECONDS = int(os.getenv('BREAKER_RESET_SECONDS', 60))
+# Let another process probe if the probing one never reports back
+BREAKER_PROBE_TIMEOUT_SECONDS = CLOUD_REQUEST_TIMEOUT_SECONDS + 5
+RETRY_UNSYNCED_INTERVAL_SECONDS = 900   # Retry unsynced summaries every 15 min
+
+# Local status API
+# Cache-Control max-age for /api/status responses
+STATUS_MAX_AGE_SECONDS = int(os.getenv('STATUS_MAX_AGE_SECONDS', 5))
+
+# Server-sent events (/api/events)
+SSE_KEEPALIVE_SECONDS = 15
+SSE_RETRY_SECONDS = 3
+# Events buffered per client before a slow client is disconnected
+SSE_QUEUE_SIZE = 100
+# Max events replayed from state_changes on Last-Event-ID resume
+SSE_REPLAY_LIMIT = 1000
+# Poll interval for new events when there is no Redis (embedded storage)
+SSE_POLL_SECONDS = 1
+
+# Attendance export (/api/export, manage.py export_attendance)
+# Rows fetched per server-side cursor round trip
+EXPORT_CHUNK_SIZE = 2000
+# Rendered lines handed to the ASGI server per thread hop
+EXPORT_STREAM_BATCH = 500
+
+# Admin changelists on large history tables
+# Unfiltered changelists use the pg_class row estimate above X rows
+ADMIN_ESTIMATED_COUNT_MIN = 50000
+# Filtered changelists stop counting at X rows
+ADMIN_COUNT_LIMIT = 10000
+# Month filter choices are recomputed after X seconds
+ADMIN_MONTHS_CACHE_SECONDS = 3600
+
+# Asyncio runtime (manage.py run_agent)
+# Threads for blocking task work; one per periodic task avoids starvation
+RUNTIME_MAX_WORKERS = int(os.getenv('RUNTIME_MAX_WORKERS', 5))
+
+# Boot (manage.py boot)
+BOOT_STARTED_CACHE_KEY = 'agent_boot_started_at'
+# Forget the boot time if no scan reported within this window, so a later
+# runtime started without boot does not measure from a stale start
+BOOT_STARTED_TTL_SECONDS = int(os.getenv('BOOT_STARTED_TTL_SECONDS', 300))
+# Seconds from container start to the end of the first scan
+TIME_TO_FIRST_SCAN_CACHE_KEY = 'agent_time_to_first_scan'
 
 # System health
 # Consider app crashed if no update in X seconds
 SYSTEM_HEARTBEAT_CHECK_SECONDS = 20
+SYSTEM_HEARTBEAT_INTERVAL_SECONDS = 30  # Update system heartbeat every 30s
+
+# Celery queues (see monitoring/schedule.py)
+# Hard time limits per queue; the soft limit fires 10s earlier
+# Scans run ceil(shards / SCAN_MAX_WORKERS) waves of up to
+# SCAN_SHARD_TIMEOUT_SECONDS each; the default leaves room for 16 waves
+# (64 /24 shards at 4 workers) plus DB work and confirmation probes
+SCAN_TASK_TIME_LIMIT_SECONDS = int(os.getenv(
+    'SCAN_TASK_TIME_LIMIT_SECONDS', 16 * SCAN_SHARD_TIMEOUT_SECONDS + 60))
+# One heartbeat per site, each bounded by CLOUD_REQUEST_TIMEOUT_SECONDS
+CLOUD_TASK_TIME_LIMIT_SECONDS = 2 * 60
+SYNC_TASK_TIME_LIMIT_SECONDS = 30 * 60
+HOUSEKEEPING_TASK_TIME_LIMIT_SECONDS = 60
+# Log a warning when a task waited longer than X seconds in its queue
+QUEUE_WAIT_WARN_SECONDS = int(os.getenv('QUEUE_WAIT_WARN_SECONDS', 5))
+
+# Task instrumentation (see monitoring/instrumentation.py)
+# Log per-phase spans, SQL query count and SQL time for every task run
+TASK_TRACE_ENABLED = os.getenv('TASK_TRACE_ENABLED') == 'True'
+# Profile task runs with cProfile and keep the slowest N as pstats files
+TASK_PROFILE_ENABLED = os.getenv('TASK_PROFILE_ENABLED') == 'True'
+TASK_PROFILE_SAMPLE_RATE = float(os.getenv('TASK_PROFILE_SAMPLE_RATE', 1.0))
+TASK_PROFILE_KEEP = int(os.getenv('TASK_PROFILE_KEEP', 5))
+TASK_PROFILE_DIR = os.getenv('TASK_PROFILE_DIR', '/tmp/stafftrace-profiles')
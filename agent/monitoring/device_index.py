@@ -0,0 +1,104 @@
+"""
+In-memory index of registered devices for the scan loop.
+
+Devices change maybe once a week, but every scan needs all of them. Each
+process keeps a compiled index (normalized MAC -> device, user -> devices,
+scan shards) and only rebuilds it when the version number in the cache
+changes. post_save / post_delete signals on Device, User and Site bump the
+version (see signals.py), so an edit in the admin reaches every worker on
+its next scan. Bulk queryset.update() calls skip signals; call
+bump_version() after them.
+"""
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+
+from .models import User
+from .scanner import build_shards
+from .services import get_normal_mac
+from .sites import get_sites
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION_CACHE_KEY = 'device_index_version'
+
+_index = None
+_lock = threading.Lock()
+
+
+class DeviceIndex:
+    """
+    Registered users and devices as of one index version.
+
+    users have their site and devices loaded, so user.devices.all() and
+    device.user need no queries.
+    """
+
+    def __init__(self, version, users, sites):
+        self.version = version
+        self.users = users
+        self.by_user = {user.id: list(user.devices.all()) for user in users}
+        self.by_mac = {}
+        for user in users:
+            for device in user.devices.all():
+                mac = get_normal_mac(device.mac_address)
+                if mac:
+                    self.by_mac[mac] = (device.id, user.id)
+        self.mac_devices = frozenset(self.by_mac)
+        self.shards = [
+            shard
+            for site in sites
+            for shard in build_shards(site.interfaces, site.subnets, site=site.site_id)
+        ]
+
+    def devices_for(self, user_id):
+        return self.by_user.get(user_id, [])
+
+
+def current_version():
+    """Index version from the cache, initialized if the cache lost it."""
+    version = cache.get(INDEX_VERSION_CACHE_KEY)
+    if version is None:
+        # Time-based so a flushed cache never reuses an old version
+        cache.add(INDEX_VERSION_CACHE_KEY, time.time_ns(), timeout=None)
+        version = cache.get(INDEX_VERSION_CACHE_KEY)
+    return version
+
+
+def bump_version():
+    """Invalidate the index in every process."""
+    try:
+        cache.incr(INDEX_VERSION_CACHE_KEY)
+    except ValueError:
+        current_version()
+
+
+def build_index(version):
+    users = list(User.objects.select_related('site').prefetch_related('devices'))
+    return DeviceIndex(version, users, get_sites())
+
+
+def get_device_index():
+    """
+    The device index, rebuilt only when its version changed.
+
+    Costs one cache read when the index is current.
+    """
+    global _index
+
+    version = current_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _lock:
+        if _index is None or _index.version != version:
+            start = time.perf_counter()
+            _index = build_index(version)
+            logger.info(
+                f"device_index rebuilt version={version} users={len(_index.users)} "
+                f"macs={len(_index.by_mac)} shards={len(_index.shards)} "
+                f"duration_ms={(time.perf_counter() - start) * 1000:.0f}")
+        return _index
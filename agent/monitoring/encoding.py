@@ -0,0 +1,152 @@
+"""
+Compact payload encoding for cloud sync.
+
+The compact format is MessagePack with integer timestamps and columnar
+arrays instead of one JSON object per record, optionally compressed with
+zstd or gzip. It is only used when the cloud advertises support for it
+(see services.post_to_cloud); otherwise payloads are sent as JSON.
+
+This module has no Django dependency so the benchmarks and the stand-in
+cloud server can use it directly.
+"""
+import gzip
+import hashlib
+import json
+from datetime import date, datetime, time
+
+try:
+    import msgpack
+except ImportError:  # compact encoding unavailable, JSON only
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON_MEDIA_TYPE = 'application/json'
+COMPACT_MEDIA_TYPE = 'application/vnd.stafftrace.compact+msgpack'
+
+EPOCH_DAY = date(1970, 1, 1)
+
+
+def available_codings():
+    """Content codings this agent can produce, best first."""
+    codings = ['gzip']
+    if zstandard is not None:
+        codings.insert(0, 'zstd')
+    return codings
+
+
+def compress(body, coding):
+    if coding == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    if coding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def decompress(body, coding):
+    if coding == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(body)
+    if coding == 'gzip':
+        return gzip.decompress(body)
+    return body
+
+
+def encode_json(payload):
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+def content_hash(payload):
+    """Stable hash of a JSON payload, independent of key order."""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def encode_compact(payload):
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def decode_compact(body):
+    return msgpack.unpackb(body, raw=False)
+
+
+def _epoch(iso):
+    return int(datetime.fromisoformat(iso).timestamp()) if iso else None
+
+
+def _day_number(iso_date):
+    return (date.fromisoformat(iso_date) - EPOCH_DAY).days
+
+
+def _seconds_of_day(iso_time):
+    t = time.fromisoformat(iso_time)
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+def _columns(records, fields):
+    return {name: [convert(record[key]) for record in records]
+            for name, key, convert in fields}
+
+
+def _same(value):
+    return value
+
+
+# (compact column, JSON key, converter); employeeName is dropped because
+# the agent always sends the fake name in both fields
+HEARTBEAT_COLUMNS = [
+    ('employeeId', 'employeeId', _same),
+    ('fakeName', 'fakeName', _same),
+    ('area', 'area', _same),
+    ('isPresent', 'isPresent', _same),
+    ('lastSeen', 'lastSeen', _epoch),
+]
+
+PRESENCE_COLUMNS = [
+    ('employeeId', 'employeeId', _same),
+    ('fakeName', 'fakeName', _same),
+    ('day', 'date', _day_number),
+    ('hour', 'hour', _same),
+    ('firstSeen', 'firstSeen', _seconds_of_day),
+    ('lastSeen', 'lastSeen', _seconds_of_day),
+    ('minutesOnline', 'minutesOnline', _same),
+]
+
+DOWNTIME_COLUMNS = [
+    ('downtimeStart', 'downtimeStart', _epoch),
+    ('downtimeEnd', 'downtimeEnd', _epoch),
+]
+
+
+def compact_heartbeat(payload):
+    """
+    Columnar form of a heartbeat payload.
+
+    Timestamps become epoch seconds and devicesOnline becomes one array
+    per field.
+    """
+    return {
+        'siteId': payload['siteId'],
+        'timestamp': _epoch(payload['timestamp']),
+        'devicesOnline': _columns(payload['devicesOnline'], HEARTBEAT_COLUMNS),
+    }
+
+
+def compact_presence(payload):
+    """
+    Columnar form of an hourly summary payload.
+
+    date becomes days since 1970-01-01 and firstSeen/lastSeen become
+    seconds since midnight.
+    """
+    compact = {
+        'siteId': payload['siteId'],
+        'timestamp': _epoch(payload['timestamp']),
+        'presenceData': _columns(payload['presenceData'], PRESENCE_COLUMNS),
+    }
+    if payload.get('agentDowntimes'):
+        compact['agentDowntimes'] = _columns(
+            payload['agentDowntimes'], DOWNTIME_COLUMNS)
+    return compact
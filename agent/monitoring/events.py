@@ -0,0 +1,184 @@
+"""
+Presence change events: Redis pub/sub publishing and SSE fan-out.
+
+save_status and check_outage publish every StateChange to a Redis
+channel. Each ASGI worker process holds a single subscription and fans
+events out to its connected clients, so subscriber count does not grow
+Redis connections or database load. Clients resume with Last-Event-ID,
+which is the StateChange id; missed events are replayed from the
+state_changes table. Without EVENTS_REDIS_URL (embedded storage) the
+subscription is replaced by polling that table once per process.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import constants
+from .models import StateChange
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = 'presence:events'
+
+_redis = None
+
+
+def event_payload(state_change):
+    """Public fields of a StateChange, as sent to subscribers."""
+    return {
+        'id': state_change.id,
+        'employeeId': state_change.user_id,
+        'employeeName': state_change.user.fake_name,
+        'status': state_change.status,
+        'timestamp': state_change.timestamp.isoformat(),
+    }
+
+
+def publish_state_change(state_change):
+    """Publish a StateChange to subscribers. Never raises."""
+    global _redis
+    if not settings.EVENTS_REDIS_URL:
+        return  # subscribers poll the database
+    try:
+        if _redis is None:
+            import redis
+            _redis = redis.Redis.from_url(settings.EVENTS_REDIS_URL)
+        _redis.publish(EVENTS_CHANNEL, json.dumps(event_payload(state_change)))
+    except Exception as e:
+        logger.warning(f"event_publish_error=\"{e}\" id={state_change.id}")
+
+
+def format_event(payload):
+    return f"id: {payload['id']}\nevent: state_change\ndata: {json.dumps(payload)}\n\n"
+
+
+class EventHub:
+    """One Redis subscription per process, fanned out to asyncio queues."""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.reader = None
+
+    def subscribe(self):
+        if self.reader is None or self.reader.done():
+            read = self._read if settings.EVENTS_REDIS_URL else self._poll
+            self.reader = asyncio.create_task(read())
+        queue = asyncio.Queue(maxsize=constants.SSE_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def close(self, queue):
+        """End a subscriber's stream; the client reconnects and resumes."""
+        self.subscribers.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def broadcast(self, payload):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # Slow client: drop it, it resumes via Last-Event-ID
+                self.close(queue)
+
+    async def _read(self):
+        import redis.asyncio as aioredis
+
+        while True:
+            client = aioredis.from_url(settings.EVENTS_REDIS_URL)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(EVENTS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        self.broadcast(json.loads(message['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"event_subscribe_error=\"{e}\"")
+                # Tell clients to reconnect; they resume from the database
+                for queue in list(self.subscribers):
+                    self.close(queue)
+                await asyncio.sleep(constants.SSE_RETRY_SECONDS)
+            finally:
+                await pubsub.close()
+                await client.close()
+
+    async def _poll(self):
+        last_id = await _latest_event_id()
+        while True:
+            await asyncio.sleep(constants.SSE_POLL_SECONDS)
+            try:
+                for payload in await _missed_events(last_id):
+                    self.broadcast(payload)
+                    last_id = payload['id']
+            except Exception as e:
+                logger.warning(f"event_poll_error=\"{e}\"")
+
+
+_hubs = {}
+
+
+def get_hub():
+    """EventHub of the running event loop."""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = EventHub()
+    return hub
+
+
+@sync_to_async
+def _latest_event_id():
+    return StateChange.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+@sync_to_async
+def _missed_events(last_event_id):
+    changes = StateChange.objects.select_related('user').filter(
+        id__gt=last_event_id
+    ).order_by('id')[:constants.SSE_REPLAY_LIMIT]
+    return [event_payload(change) for change in changes]
+
+
+async def stream_events(last_event_id=None):
+    """
+    Server-sent events for presence changes.
+
+    Args:
+        last_event_id: Resume after this StateChange id
+    """
+    hub = get_hub()
+    queue = hub.subscribe()
+    try:
+        yield f"retry: {constants.SSE_RETRY_SECONDS * 1000}\n\n"
+
+        last_sent = last_event_id or 0
+        if last_event_id is not None:
+            for payload in await _missed_events(last_event_id):
+                last_sent = payload['id']
+                yield format_event(payload)
+
+        while True:
+            try:
+                payload = await asyncio.wait_for(
+                    queue.get(), timeout=constants.SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            if payload is None:
+                return
+            if payload['id'] <= last_sent:
+                continue
+            last_sent = payload['id']
+            yield format_event(payload)
+    finally:
+        hub.unsubscribe(queue)
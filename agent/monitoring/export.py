@@ -0,0 +1,129 @@
+"""
+Attendance export for payroll: one row per employee and local day.
+
+Rows are aggregated from hourly summaries while reading them through a
+server-side cursor ordered by user and hour, so memory stays constant
+regardless of the date range. Used by the /api/export view and the
+export_attendance management command.
+"""
+import csv
+import io
+import json
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from . import constants
+from .models import HourlySummary
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+FIELDS = ['date', 'employee_id', 'employee_name', 'fake_name',
+          'arrival', 'departure', 'minutes_online', 'hours']
+
+
+def parse_date_range(start, end):
+    """
+    Parse an inclusive YYYY-MM-DD range.
+
+    Raises:
+        ValueError: On malformed dates or end before start
+    """
+    start_date = datetime.strptime(start, '%Y-%m-%d').date()
+    end_date = datetime.strptime(end, '%Y-%m-%d').date()
+    if end_date < start_date:
+        raise ValueError('end is before start')
+    return start_date, end_date
+
+
+def attendance_rows(start_date, end_date, user_ids=None):
+    """
+    Daily attendance between two local dates (inclusive).
+
+    Args:
+        start_date: First day
+        end_date: Last day
+        user_ids: Optional iterable of user ids to restrict to
+
+    Yields:
+        dict: One row per employee and day with presence, keyed by FIELDS
+    """
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+    end = timezone.make_aware(
+        datetime.combine(end_date + timedelta(days=1), time.min), tz)
+
+    summaries = HourlySummary.objects.filter(hour__gte=start, hour__lt=end)
+    if user_ids is not None:
+        summaries = summaries.filter(user_id__in=list(user_ids))
+
+    records = summaries.order_by('user_id', 'hour').values_list(
+        'user_id', 'user__employee_name', 'user__fake_name',
+        'hour', 'first_seen', 'last_seen', 'minutes_online',
+    ).iterator(chunk_size=constants.EXPORT_CHUNK_SIZE)
+
+    row = None
+    for user_id, name, fake_name, hour, first_seen, last_seen, minutes in records:
+        day = timezone.localtime(hour, tz).date()
+        if row is None or row['employee_id'] != user_id or row['date'] != day:
+            if row is not None:
+                yield _finish(row)
+            row = {
+                'date': day,
+                'employee_id': user_id,
+                'employee_name': name,
+                'fake_name': fake_name,
+                'arrival': first_seen,
+                'departure': last_seen,
+                'minutes_online': 0,
+            }
+        if row['arrival'] is None:
+            row['arrival'] = first_seen
+        row['minutes_online'] += minutes
+        if last_seen is not None:
+            row['departure'] = last_seen
+
+    if row is not None:
+        yield _finish(row)
+
+
+def _finish(row):
+    for key in ('arrival', 'departure'):
+        if row[key] is not None:
+            row[key] = timezone.localtime(row[key]).time().isoformat('seconds')
+    row['date'] = row['date'].isoformat()
+    row['hours'] = round(row['minutes_online'] / 60, 2)
+    return row
+
+
+def render(rows, fmt):
+    """
+    Render rows as text lines in an export format.
+
+    Args:
+        rows: Rows from attendance_rows
+        fmt: Key of FORMATS
+
+    Yields:
+        str: Header line (CSV only), then one line per row
+    """
+    if fmt == 'ndjson':
+        for row in rows:
+            yield json.dumps(row) + '\n'
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+
+    def line(write, *args):
+        buffer.seek(0)
+        buffer.truncate()
+        write(*args)
+        return buffer.getvalue()
+
+    yield line(writer.writeheader)
+    for row in rows:
+        yield line(writer.writerow, row)
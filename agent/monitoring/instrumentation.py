@@ -0,0 +1,161 @@
+"""
+Task instrumentation: per-phase spans, SQL stats and opt-in profiling.
+
+Tracing and profiling are both disabled by default; enable them with
+TASK_TRACE_ENABLED=True and/or TASK_PROFILE_ENABLED=True.
+"""
+import functools
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connection
+
+from . import constants
+
+logger = logging.getLogger('monitoring.trace')
+
+# Phases recorded by span()
+PHASE_SCAN = 'scan'
+PHASE_DB_READ = 'db_read'
+PHASE_DB_WRITE = 'db_write'
+PHASE_HTTP = 'http'
+
+_current_trace = ContextVar('current_trace', default=None)
+
+
+class TaskTrace:
+    """Span and SQL timings collected during a single task run."""
+
+    def __init__(self, task_name):
+        self.task_name = task_name
+        self.spans = {}
+        self.queries = 0
+        self.sql_seconds = 0.0
+
+    def add_span(self, phase, seconds):
+        self.spans[phase] = self.spans.get(phase, 0.0) + seconds
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_seconds += time.perf_counter() - start
+
+
+@contextmanager
+def span(phase):
+    """Time a block of work under the given phase of the current task."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(phase, time.perf_counter() - start)
+
+
+def instrumented(func):
+    """
+    Wrap a task so its spans, SQL query count and SQL time are logged.
+
+    Nested calls (e.g. ping_all_devices calling send_heartbeat_to_cloud)
+    are accounted to the outer task.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        enabled = constants.TASK_TRACE_ENABLED or constants.TASK_PROFILE_ENABLED
+        if not enabled or _current_trace.get() is not None:
+            return func(*args, **kwargs)
+
+        trace = TaskTrace(func.__name__)
+        token = _current_trace.set(trace)
+        profiler = _start_profiler()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(trace.sql_wrapper):
+                return func(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            _current_trace.reset(token)
+            if profiler:
+                profiler.disable()
+                _keep_profile(profiler, trace.task_name, duration)
+            if constants.TASK_TRACE_ENABLED:
+                _log_trace(trace, duration)
+
+    return wrapper
+
+
+def _log_trace(trace, duration):
+    fields = {
+        'task': trace.task_name,
+        'duration_ms': round(duration * 1000, 1),
+        'queries': trace.queries,
+        'sql_ms': round(trace.sql_seconds * 1000, 1),
+    }
+    for phase, seconds in trace.spans.items():
+        fields[f'{phase}_ms'] = round(seconds * 1000, 1)
+
+    message = ' '.join(f'{key}={value}' for key, value in fields.items())
+    logger.info(message, extra={'trace': fields})
+
+
+def _start_profiler():
+    if not constants.TASK_PROFILE_ENABLED:
+        return None
+    if random.random() >= constants.TASK_PROFILE_SAMPLE_RATE:
+        return None
+
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _keep_profile(profiler, task_name, duration):
+    """
+    Dump a pstats file if this run is among the slowest N for the task.
+
+    Files are named <task>-<duration_ms>.prof so the retained set can be
+    ranked from the directory listing alone.
+    """
+    profile_dir = constants.TASK_PROFILE_DIR
+    keep = constants.TASK_PROFILE_KEEP
+    duration_ms = int(duration * 1000)
+    if keep <= 0:
+        return
+
+    try:
+        os.makedirs(profile_dir, exist_ok=True)
+        existing = []
+        for name in os.listdir(profile_dir):
+            prefix, _, rest = name.rpartition('-')
+            if prefix != task_name or not rest.endswith('.prof'):
+                continue
+            try:
+                existing.append((int(rest[:-5]), name))
+            except ValueError:
+                continue
+        filename = f'{task_name}-{duration_ms}.prof'
+        existing = sorted(e for e in existing if e[1] != filename)
+
+        if len(existing) >= keep and existing[0][0] >= duration_ms:
+            return
+
+        path = os.path.join(profile_dir, filename)
+        profiler.dump_stats(path)
+        logger.info(f'task={task_name} profile={path}')
+
+        for _, name in existing[:max(0, len(existing) + 1 - keep)]:
+            os.remove(os.path.join(profile_dir, name))
+    except OSError as e:
+        logger.warning(f'task={task_name} profile_error="{e}"')
@@ -6,6 +6,8 @@ from django.utils import timezone
 from datetime import timedelta
 from monitoring.models import SystemStatus, StateChange, Device, AgentDowntime
 from monitoring.constants import SYSTEM_HEARTBEAT_CHECK_SECONDS, OFFLINE_THRESHOLD_SECONDS
+from monitoring.status import refresh_status_snapshot
+from monitoring.events import publish_state_change
 
 
 class Command(BaseCommand):
@@ -36,12 +38,13 @@ class Command(BaseCommand):
                     # Mark as offline at estimated time
                     offline_time = system.updated_at
 
-                    StateChange.objects.create(
+                    state_change = StateChange.objects.create(
                         device=device,
                         user=device.user,
                         timestamp=offline_time,
                         status=0  # went offline
                     )
+                    publish_state_change(state_change)
 
                     self.stdout.write(
                         f'Marked {device.user.employee_name} offline at' +
@@ -52,3 +55,6 @@ class Command(BaseCommand):
 
         # Update system heartbeat
         system.save()
+
+        # Local /api/status may still show pre-outage presence
+        refresh_status_snapshot()
@@ -0,0 +1,37 @@
+"""
+Management command to export daily attendance for payroll.
+
+Streams CSV or NDJSON for a date range to stdout or a file, with constant
+memory (see monitoring.export).
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.export import FORMATS, attendance_rows, parse_date_range, render
+
+
+class Command(BaseCommand):
+    help = 'Export daily arrivals, departures and hours per employee'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True, help='First day, YYYY-MM-DD')
+        parser.add_argument('--end', required=True, help='Last day (inclusive), YYYY-MM-DD')
+        parser.add_argument(
+            '--users', type=int, nargs='+', help='Only these user ids')
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', help='File to write instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            start_date, end_date = parse_date_range(options['start'], options['end'])
+        except ValueError as e:
+            raise CommandError(f'Invalid date range: {e}')
+
+        lines = render(
+            attendance_rows(start_date, end_date, options['users']), options['format'])
+
+        if options['output']:
+            with open(options['output'], 'w', newline='') as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
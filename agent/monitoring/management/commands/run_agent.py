@@ -0,0 +1,122 @@
+"""
+Management command to run the agent as a single asyncio process.
+
+Alternative to Celery worker + beat: the periodic tasks from
+monitoring.schedule run directly in this process, blocking work goes to
+a thread pool, and the ASGI app can be served from the same event loop.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from monitoring import tasks
+from monitoring.constants import RUNTIME_MAX_WORKERS
+from monitoring.schedule import PERIODIC_TASKS, HOURLY
+
+logger = logging.getLogger('monitoring.runtime')
+
+
+def seconds_until_next_hour():
+    now = timezone.localtime()
+    next_hour = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    return (next_hour - now).total_seconds()
+
+
+def run_task(task):
+    """Run a task body in a worker thread with its own DB connection."""
+    close_old_connections()
+    try:
+        task()
+    except Exception:
+        logger.exception(f"task={task.name} status=failed")
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Run periodic tasks in one asyncio process instead of Celery worker + beat'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--http', metavar='HOST:PORT',
+            help='Also serve the ASGI app (admin, /api) from this process')
+        parser.add_argument(
+            '--boot', action='store_true',
+            help='Run the boot command in this process before scheduling')
+        parser.add_argument(
+            '--started-at', type=float,
+            help='Epoch time the container started, passed on to boot')
+
+    def handle(self, *args, **options):
+        if options['boot']:
+            call_command('boot', started_at=options['started_at'])
+        asyncio.run(self.main(options['http']))
+
+    async def main(self, http):
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(
+            max_workers=RUNTIME_MAX_WORKERS, thread_name_prefix='agent-task')
+        loop.set_default_executor(executor)
+        # Tasks started from other tasks (heartbeat after a scan) share the pool
+        tasks.task_dispatcher = lambda task: executor.submit(run_task, task)
+
+        jobs = [
+            asyncio.create_task(self.schedule(name, import_string(task), interval))
+            for name, (task, interval) in PERIODIC_TASKS.items()
+        ]
+        if http:
+            jobs.append(asyncio.create_task(self.serve(http)))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Agent runtime started: {len(PERIODIC_TASKS)} periodic tasks'
+            + (f', serving on {http}' if http else '')))
+
+        # Schedules run forever; the web server returning means shutdown
+        done, pending = await asyncio.wait(jobs, return_when=asyncio.FIRST_COMPLETED)
+        for job in pending:
+            job.cancel()
+        for job in done:
+            job.result()
+
+    async def schedule(self, name, task, interval):
+        """
+        Run a task at a fixed rate, the way Celery beat would.
+
+        Runs of the same task never overlap; ticks missed while a run was
+        still busy are skipped instead of queued.
+        """
+        loop = asyncio.get_running_loop()
+
+        if interval == HOURLY:
+            while True:
+                await asyncio.sleep(seconds_until_next_hour())
+                await loop.run_in_executor(None, run_task, task)
+
+        next_run = time.monotonic()
+        while True:
+            await loop.run_in_executor(None, run_task, task)
+            next_run += interval
+            now = time.monotonic()
+            if next_run < now:
+                skipped = int((now - next_run) // interval) + 1
+                next_run += skipped * interval
+                logger.warning(f"task={name} skipped_ticks={skipped}")
+            await asyncio.sleep(next_run - now)
+
+    async def serve(self, http):
+        import uvicorn
+        from config.asgi import application
+
+        host, _, port = http.rpartition(':')
+        config = uvicorn.Config(
+            application, host=host or '0.0.0.0', port=int(port),
+            lifespan='off', log_level='warning')
+        await uvicorn.Server(config).serve()
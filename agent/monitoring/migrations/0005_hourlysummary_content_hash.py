@@ -0,0 +1,54 @@
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+def content_hash(payload):
+    # Frozen copy of monitoring.encoding.content_hash as of this migration
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def backfill_hashes(apps, schema_editor):
+    """Hash existing summaries; rows already synced count as acknowledged."""
+    HourlySummary = apps.get_model('monitoring', 'HourlySummary')
+    summaries = HourlySummary.objects.select_related('user').filter(
+        first_seen__isnull=False, last_seen__isnull=False)
+
+    for summary in summaries.iterator(chunk_size=500):
+        # Same shape as HourlySummary.to_payload()
+        summary.content_hash = content_hash({
+            'employeeId': summary.user.id,
+            'employeeName': summary.user.fake_name,
+            'fakeName': summary.user.fake_name,
+            'date': summary.hour.date().isoformat(),
+            'hour': summary.hour.hour,
+            'firstSeen': summary.first_seen.time().isoformat(),
+            'lastSeen': summary.last_seen.time().isoformat(),
+            'minutesOnline': summary.minutes_online
+        })
+        if summary.synced:
+            summary.synced_hash = summary.content_hash
+        summary.save(update_fields=['content_hash', 'synced_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0004_agentdowntime_synced'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hourlysummary',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='hourlysummary',
+            name='synced_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(backfill_hashes, migrations.RunPython.noop),
+    ]
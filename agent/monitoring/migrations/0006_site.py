@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-19 06:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0005_hourlysummary_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Site',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('site_id', models.CharField(max_length=100, unique=True)),
+                ('subnet', models.CharField(max_length=255)),
+                ('network_interface', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'sites',
+                'ordering': ['site_id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='site',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='users', to='monitoring.site'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-19 06:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0006_site'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hourlysummary',
+            index=models.Index(fields=['-hour', '-id'], name='hourly_summ_hour_e64749_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statechange',
+            index=models.Index(fields=['-timestamp', '-id'], name='state_chang_timesta_5a7274_idx'),
+        ),
+    ]
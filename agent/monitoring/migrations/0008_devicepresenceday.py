@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-19 06:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0007_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DevicePresenceDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('bits', models.BinaryField()),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='presence_days', to='monitoring.device')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='presence_days', to='monitoring.user')),
+            ],
+            options={
+                'db_table': 'device_presence_days',
+                'indexes': [models.Index(fields=['user', 'day'], name='device_pres_user_id_a5f858_idx')],
+                'unique_together': {('device', 'day')},
+            },
+        ),
+    ]
@@ -1,11 +1,31 @@
 from django.db import models
 
 
+class Site(models.Model):
+    """Office served by this agent, with its own network and cloud siteId."""
+    site_id = models.CharField(max_length=100, unique=True)
+    # Comma-separated, same format as the SUBNET / NETWORK_INTERFACE settings
+    subnet = models.CharField(max_length=255)
+    network_interface = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['site_id']
+        db_table = 'sites'
+
+    def __str__(self):
+        return self.site_id
+
+
 class User(models.Model):
     """Employee/User model with real and fake names."""
     employee_name = models.CharField(max_length=100, unique=True)
     fake_name = models.CharField(max_length=100)
     display_order = models.IntegerField(unique=True)
+    # Users without a site belong to the default SITE_ID / SUBNET site
+    site = models.ForeignKey(
+        Site, on_delete=models.PROTECT, related_name='users',
+        null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -66,6 +86,8 @@ class StateChange(models.Model):
         indexes = [
             models.Index(fields=['user', '-timestamp']),
             models.Index(fields=['device', '-timestamp']),
+            # Admin keyset pagination (see monitoring/changelist.py)
+            models.Index(fields=['-timestamp', '-id']),
         ]
 
     def __str__(self):
@@ -82,16 +104,60 @@ class HourlySummary(models.Model):
     last_seen = models.DateTimeField(null=True)
     minutes_online = models.IntegerField(default=0)
     synced = models.BooleanField(default=False)
+    # Hash of the cloud payload, and of the last payload the cloud acknowledged
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    synced_hash = models.CharField(max_length=64, blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'hourly_summaries'
         unique_together = ['user', 'hour']
         ordering = ['-hour']
+        indexes = [
+            models.Index(fields=['-hour', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.user.employee_name} - {self.hour} ({self.minutes_online}min)"
 
+    def to_payload(self):
+        """Cloud presenceData entry for this summary."""
+        return {
+            'employeeId': self.user.id,
+            'employeeName': self.user.fake_name,
+            'fakeName': self.user.fake_name,
+            'date': self.hour.date().isoformat(),
+            'hour': self.hour.hour,
+            'firstSeen': self.first_seen.time().isoformat(),
+            'lastSeen': self.last_seen.time().isoformat(),
+            'minutesOnline': self.minutes_online
+        }
+
+
+class DevicePresenceDay(models.Model):
+    """
+    One local day of a device's presence, one bit per scan slot.
+
+    Bit i of bits (little-endian) covers PRESENCE_SLOT_SECONDS starting at
+    i * PRESENCE_SLOT_SECONDS after local midnight. See monitoring/presence.py.
+    """
+    device = models.ForeignKey(
+        Device, on_delete=models.CASCADE, related_name='presence_days')
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='presence_days')
+    day = models.DateField()
+    bits = models.BinaryField()
+
+    class Meta:
+        db_table = 'device_presence_days'
+        unique_together = ['device', 'day']
+        indexes = [
+            models.Index(fields=['user', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.device} - {self.day}"
+
 
 class SystemStatus(models.Model):
     """System status model - single row to track system heartbeat."""
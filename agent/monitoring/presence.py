@@ -0,0 +1,191 @@
+"""
+Per-device presence bitmaps at scan resolution.
+
+Every scan sets the current slot's bit for the devices it saw, so a day of
+presence is SLOTS_PER_DAY bits (90 bytes at the default 2-minute slot),
+stored only for days a device was present. Day, week and month totals and
+heatmaps are computed on Python ints: OR merges a user's devices, and
+int.bit_count() counts present slots for a whole day at once, without
+replaying state changes.
+
+The last probed state of every device is kept in the cache. Devices a
+scan did not probe keep that state for PRESENCE_CARRY_SECONDS, across day
+boundaries, and slots skipped between two present probes (beat drift,
+long scans) are filled in.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import constants
+from .models import DevicePresenceDay
+
+SLOTS_PER_DAY = math.ceil(86400 / constants.PRESENCE_SLOT_SECONDS)
+BYTES_PER_DAY = math.ceil(SLOTS_PER_DAY / 8)
+
+# device id -> (epoch seconds, present) of the last scan that probed it
+PRESENCE_STATE_CACHE_KEY = 'presence_last_state'
+
+
+def pack(value):
+    return value.to_bytes(BYTES_PER_DAY, 'little')
+
+
+def unpack(bits):
+    return int.from_bytes(bits, 'little')
+
+
+def slot_for(moment):
+    """Day and slot of a datetime, in local time."""
+    local = timezone.localtime(moment)
+    seconds = local.hour * 3600 + local.minute * 60 + local.second
+    return local.date(), seconds // constants.PRESENCE_SLOT_SECONDS
+
+
+def record_scan(index, seen, probed, when=None):
+    """
+    Set the current slot for devices present in a scan.
+
+    Devices that were not probed this time (adaptive scheduling, failed
+    shards) keep their last probed state for PRESENCE_CARRY_SECONDS.
+
+    Args:
+        index: DeviceIndex of the scan
+        seen: Ids of devices seen by the scan or confirmation probes
+        probed: Ids of devices the scan was conclusive for
+        when: Scan time, defaults to now
+    """
+    now = when or timezone.now()
+    timestamp = int(now.timestamp())
+    day, slot = slot_for(now)
+    horizon = timestamp - constants.PRESENCE_CARRY_SECONDS
+
+    last_states = cache.get(PRESENCE_STATE_CACHE_KEY) or {}
+    states = {}
+    rows = {row.device_id: row for row in DevicePresenceDay.objects.filter(day=day)}
+    to_update, to_create = [], []
+
+    for user in index.users:
+        for device in user.devices.all():
+            row = rows.get(device.id)
+            value = unpack(row.bits) if row else 0
+            last = last_states.get(device.id)
+            recent = last if last and last[0] >= horizon else None
+
+            if device.id in seen or device.id in probed:
+                present = device.id in seen
+                states[device.id] = (timestamp, present)
+            else:
+                present = bool(recent and recent[1])
+                if last:
+                    states[device.id] = last
+
+            if not present:
+                continue
+
+            # Also fill the slots skipped since the last present probe
+            start = slot
+            if recent and recent[1]:
+                last_day, last_slot = slot_for(
+                    datetime.fromtimestamp(recent[0], tz=dt_timezone.utc))
+                start = min(last_slot, slot) if last_day == day else 0
+            mask = ((1 << (slot + 1)) - 1) >> start << start
+            if value & mask == mask:
+                continue
+
+            value |= mask
+            if row:
+                row.bits = pack(value)
+                to_update.append(row)
+            else:
+                to_create.append(DevicePresenceDay(
+                    device_id=device.id, user_id=user.id, day=day, bits=pack(value)))
+
+    if to_update:
+        DevicePresenceDay.objects.bulk_update(to_update, ['bits'])
+    if to_create:
+        DevicePresenceDay.objects.bulk_create(to_create, ignore_conflicts=True)
+    cache.set(PRESENCE_STATE_CACHE_KEY, states, timeout=None)
+
+
+def user_days(user_id, start_date, end_date):
+    """
+    Presence bitmaps of a user, all devices merged.
+
+    Returns:
+        dict[date, int]: Days with any presence between start_date and
+        end_date (inclusive)
+    """
+    rows = DevicePresenceDay.objects.filter(
+        user_id=user_id, day__gte=start_date, day__lte=end_date,
+    ).values_list('day', 'bits')
+
+    days = {}
+    for day, bits in rows:
+        days[day] = days.get(day, 0) | unpack(bits)
+    return days
+
+
+def minutes(value):
+    return value.bit_count() * constants.PRESENCE_SLOT_SECONDS / 60
+
+
+def _period_key(day, period):
+    if period == 'week':
+        year, week, _ = day.isocalendar()
+        return f'{year}-W{week:02d}'
+    if period == 'month':
+        return f'{day.year}-{day.month:02d}'
+    return day.isoformat()
+
+
+def presence_minutes(user_id, start_date, end_date, period='day'):
+    """
+    Minutes a user was present, per day, ISO week or month.
+
+    Args:
+        period: 'day', 'week' or 'month'
+
+    Returns:
+        dict[str, float]: Period key (2025-03-03, 2025-W10, 2025-03) ->
+        minutes, only for periods with presence
+    """
+    totals = {}
+    for day, value in sorted(user_days(user_id, start_date, end_date).items()):
+        key = _period_key(day, period)
+        totals[key] = totals.get(key, 0) + minutes(value)
+    return totals
+
+
+def heatmap(user_id, start_date, end_date):
+    """
+    Presence by weekday and hour over a date range.
+
+    Returns:
+        list[list[float]]: 7 rows (Monday first) of 24 hourly values, each
+        the share of that hour's slots the user was present, averaged over
+        the matching days in the range
+    """
+    slots_per_hour = 3600 // constants.PRESENCE_SLOT_SECONDS or 1
+    hour_mask = (1 << slots_per_hour) - 1
+    days = user_days(user_id, start_date, end_date)
+
+    present = [[0] * 24 for _ in range(7)]
+    day_count = [0] * 7
+    day = start_date
+    while day <= end_date:
+        weekday = day.weekday()
+        day_count[weekday] += 1
+        value = days.get(day, 0)
+        for hour in range(24 if value else 0):
+            present[weekday][hour] += (
+                (value >> (hour * slots_per_hour)) & hour_mask).bit_count()
+        day += timedelta(days=1)
+
+    return [
+        [round(slots / (slots_per_hour * day_count[weekday]), 3)
+         if day_count[weekday] else 0.0 for slots in hours]
+        for weekday, hours in enumerate(present)
+    ]
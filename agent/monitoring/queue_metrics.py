@@ -0,0 +1,45 @@
+"""
+Celery queue wait time metrics.
+
+Every published task is stamped with its publish time; when a worker
+starts it, the time spent waiting in the queue is logged and the latest
+value per queue is kept in the cache. Connected from config/celery.py.
+"""
+import logging
+import time
+
+from celery.signals import before_task_publish, task_prerun
+from django.core.cache import cache
+
+from . import constants
+
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT_CACHE_KEY = 'queue_wait_ms:{queue}'
+
+
+@before_task_publish.connect
+def stamp_publish_time(headers=None, **kwargs):
+    if headers is not None:
+        headers['published_at'] = time.time()
+
+
+@task_prerun.connect
+def record_queue_wait(task=None, **kwargs):
+    published_at = getattr(task.request, 'published_at', None)
+    if published_at is None:
+        return
+
+    wait_ms = (time.time() - published_at) * 1000
+    queue = (task.request.delivery_info or {}).get('routing_key') or 'unknown'
+    message = f"queue_wait queue={queue} task={task.name} wait_ms={wait_ms:.0f}"
+    if wait_ms > constants.QUEUE_WAIT_WARN_SECONDS * 1000:
+        logger.warning(message)
+    else:
+        logger.info(message)
+
+    try:
+        cache.set(QUEUE_WAIT_CACHE_KEY.format(queue=queue), round(wait_ms), timeout=None)
+    except Exception:
+        # Metrics must never fail a task
+        pass
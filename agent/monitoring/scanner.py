@@ -0,0 +1,264 @@
+"""
+Sharded arp-scan for large or multiple subnets.
+
+Each subnet of every site is split into sub-ranges of SCAN_SHARD_PREFIX
+and paired with the interfaces it should be scanned on. Shards of all
+sites run concurrently on one bounded thread pool; a failing shard only
+makes the devices inside it unknown, it never empties the whole result.
+"""
+import ipaddress
+import logging
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+
+from . import constants
+from .sites import get_sites
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    One arp-scan invocation: a sub-range on a single interface of a site.
+
+    When hosts is set only those addresses are probed instead of the
+    whole sub-range.
+    """
+    interface: str
+    network: ipaddress.IPv4Network
+    hosts: tuple = ()
+    site: str = ''
+
+    def __str__(self):
+        name = f"{self.site}/" if self.site else ''
+        name += f"{self.interface}:{self.network}"
+        if self.hosts:
+            return f"{name}[{len(self.hosts)} hosts]"
+        return name
+
+
+@dataclass
+class ScanResult:
+    """Merged result of all shards of a scan."""
+    macs: set = field(default_factory=set)
+    # MAC -> IP address it answered from
+    addresses: dict = field(default_factory=dict)
+    scanned: list = field(default_factory=list)
+    failed: list = field(default_factory=list)
+    timings: dict = field(default_factory=dict)
+
+    def merge(self, other):
+        """Add the result of a follow-up scan to this one."""
+        self.macs |= other.macs
+        self.addresses.update(other.addresses)
+        self.scanned += other.scanned
+        self.failed += other.failed
+        self.timings.update(other.timings)
+
+    def covers(self, ip_address, site=None):
+        """
+        Check whether the scan result is conclusive for an IP address.
+
+        Returns False when the address only falls into failed shards (or
+        every shard failed), meaning a missing MAC says nothing about it.
+        With site, only that site's shards are considered.
+        """
+        scanned, failed = self.scanned, self.failed
+        if site is not None:
+            scanned = [shard for shard in scanned if shard.site == site]
+            failed = [shard for shard in failed if shard.site == site]
+
+        if not scanned:
+            return False
+        if not failed:
+            return True
+
+        try:
+            ip = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return True
+
+        if any(ip in shard.network for shard in scanned):
+            return True
+        return not any(ip in shard.network for shard in failed)
+
+
+def build_shards(interfaces, subnets, shard_prefix=None, site=''):
+    """
+    Build scan shards from interfaces and subnets.
+
+    Args:
+        interfaces: Interfaces to scan unpinned subnets on
+        subnets: CIDR strings, optionally pinned with "cidr@interface"
+        shard_prefix: Split networks larger than this prefix length
+        site: siteId the shards belong to
+
+    Returns:
+        list[Shard]: One shard per (sub-range, interface)
+    """
+    if shard_prefix is None:
+        shard_prefix = constants.SCAN_SHARD_PREFIX
+
+    shards = []
+    for entry in subnets:
+        cidr, _, pinned = entry.partition('@')
+        network = ipaddress.ip_network(cidr.strip(), strict=False)
+        targets = [pinned.strip()] if pinned else interfaces
+
+        if network.prefixlen < shard_prefix:
+            parts = list(network.subnets(new_prefix=shard_prefix))
+        else:
+            parts = [network]
+
+        for interface in targets:
+            for part in parts:
+                shards.append(Shard(interface, part, site=site))
+
+    return shards
+
+
+def get_shards():
+    """Shards of every site (see sites.get_sites)."""
+    return [
+        shard
+        for site in get_sites()
+        for shard in build_shards(site.interfaces, site.subnets, site=site.site_id)
+    ]
+
+
+def restrict_shards(shards, hosts):
+    """
+    Narrow shards down to the given host addresses.
+
+    Args:
+        shards: Shards of a full scan
+        hosts: (site, ip) pairs; each ip is only probed on its site's shards
+
+    Returns:
+        list[Shard] | None: Shards probing only the hosts, or None when a
+        host is outside every shard and only a full scan can find it
+    """
+    by_shard = {}
+    for site, host in hosts:
+        try:
+            ip = ipaddress.ip_address(host)
+        except ValueError:
+            return None
+
+        matched = [shard for shard in shards
+                   if shard.site == site and ip in shard.network]
+        if not matched:
+            return None
+        for shard in matched:
+            by_shard.setdefault(shard, []).append(str(ip))
+
+    return [replace(shard, hosts=tuple(ips)) for shard, ips in by_shard.items()]
+
+
+def interface_for_ip(ip_address, shards=None, site=None):
+    """Interface whose shard contains the IP, else the first interface."""
+    if shards is None:
+        shards = get_shards()
+    if site is not None:
+        shards = [shard for shard in shards if shard.site == site] or shards
+
+    try:
+        ip = ipaddress.ip_address(ip_address)
+    except ValueError:
+        ip = None
+
+    for shard in shards:
+        if ip is not None and ip in shard.network:
+            return shard.interface
+    return shards[0].interface if shards else None
+
+
+def scan_shard(shard, mac_devices):
+    """
+    Run arp-scan over one shard.
+
+    Returns:
+        dict[str, str]: Known MACs seen in the shard -> IP they answered from
+
+    Raises:
+        subprocess.SubprocessError, OSError: if arp-scan fails or times out
+    """
+    command = [
+        'arp-scan',
+        '--interface', shard.interface,
+        '--retry', '4',
+        '--timeout', '500',
+        *(shard.hosts or [str(shard.network)])
+    ]
+
+    result = subprocess.run(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        timeout=constants.SCAN_SHARD_TIMEOUT_SECONDS,
+        text=True,
+        check=True
+    )
+
+    mac_adresses = {}
+    for line in result.stdout.split('\n'):
+        parts = line.lower().split()
+        for p in parts:
+            if p.count(':') == 5 and p in mac_devices:
+                # arp-scan lines start with the responding IP
+                mac_adresses[p] = parts[0]
+
+    return mac_adresses
+
+
+def _timed_scan(shard, mac_devices):
+    start = time.perf_counter()
+    try:
+        return shard, scan_shard(shard, mac_devices), None, time.perf_counter() - start
+    except Exception as e:
+        return shard, {}, e, time.perf_counter() - start
+
+
+def scan_shards(shards, mac_devices):
+    """
+    Scan all shards concurrently and merge the results.
+
+    Args:
+        shards: Shards to scan
+        mac_devices: Normalized MACs of registered devices
+
+    Returns:
+        ScanResult: Merged MACs plus per-shard timing and failures
+    """
+    result = ScanResult()
+    if not shards:
+        return result
+
+    workers = max(1, min(constants.SCAN_MAX_WORKERS, len(shards)))
+    if workers == 1:
+        outcomes = [_timed_scan(shard, mac_devices) for shard in shards]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(
+                lambda shard: _timed_scan(shard, mac_devices), shards))
+
+    for shard, macs, error, duration in outcomes:
+        result.timings[str(shard)] = duration
+        if error is not None:
+            result.failed.append(shard)
+            logger.warning(
+                f"shard={shard} status=failed duration_ms={duration * 1000:.0f} "
+                f"error=\"{type(error).__name__}: {error}\"")
+            continue
+
+        result.scanned.append(shard)
+        result.macs.update(macs)
+        result.addresses.update(macs)
+        logger.debug(
+            f"shard={shard} status=ok duration_ms={duration * 1000:.0f} "
+            f"macs={len(macs)}")
+
+    return result
@@ -0,0 +1,47 @@
+"""
+Periodic task schedule shared by Celery beat and the asyncio runtime,
+and the Celery queue each task runs on.
+"""
+from . import constants
+
+# Run at the top of every hour instead of at a fixed interval
+HOURLY = 'hourly'
+
+# name -> (task, interval in seconds or HOURLY)
+PERIODIC_TASKS = {
+    'ping-devices': (
+        'monitoring.tasks.ping_all_devices', constants.PING_TICK_SECONDS),
+    'send-heartbeat': (
+        'monitoring.tasks.send_heartbeat_to_cloud', constants.HEARTBEAT_INTERVAL_SECONDS),
+    'send-hourly-summary': (
+        'monitoring.tasks.send_hourly_summary_to_cloud', HOURLY),
+    'update-system-heartbeat': (
+        'monitoring.tasks.update_system_heartbeat', constants.SYSTEM_HEARTBEAT_INTERVAL_SECONDS),
+    'retry-unsynced-summaries': (
+        'monitoring.tasks.retry_unsynced_summaries', constants.RETRY_UNSYNCED_INTERVAL_SECONDS),
+}
+
+# Celery queues, each consumed by its own worker (see entrypoint.sh) so a
+# slow cloud call never delays a scan
+QUEUE_SCAN = 'scan'                   # latency-critical, local only: scans,
+                                      # system heartbeat for outage detection
+QUEUE_CLOUD = 'cloud'                 # small cloud calls: heartbeats
+QUEUE_SYNC = 'sync'                   # bulk cloud uploads
+QUEUE_HOUSEKEEPING = 'housekeeping'   # everything else
+
+# task -> queue
+TASK_QUEUES = {
+    'monitoring.tasks.ping_all_devices': QUEUE_SCAN,
+    'monitoring.tasks.update_system_heartbeat': QUEUE_SCAN,
+    'monitoring.tasks.send_heartbeat_to_cloud': QUEUE_CLOUD,
+    'monitoring.tasks.send_hourly_summary_to_cloud': QUEUE_SYNC,
+    'monitoring.tasks.retry_unsynced_summaries': QUEUE_SYNC,
+}
+
+# queue -> hard time limit in seconds
+QUEUE_TIME_LIMITS = {
+    QUEUE_SCAN: constants.SCAN_TASK_TIME_LIMIT_SECONDS,
+    QUEUE_CLOUD: constants.CLOUD_TASK_TIME_LIMIT_SECONDS,
+    QUEUE_SYNC: constants.SYNC_TASK_TIME_LIMIT_SECONDS,
+    QUEUE_HOUSEKEEPING: constants.HOUSEKEEPING_TASK_TIME_LIMIT_SECONDS,
+}
@@ -0,0 +1,213 @@
+"""
+Adaptive per-device scan scheduling.
+
+Instead of probing every device on every scan, each device gets its own
+next-due time. Devices that just changed state, users with a pending
+miss and offline users inside an arrival window learned from StateChange
+history are probed every tick. Devices are probed less often at night,
+on weekends and once they have been stable for a while. A full sweep of
+every subnet runs at least every ADAPTIVE_SWEEP_SECONDS, so devices that
+changed address are found again.
+
+All devices of a user are probed together so "every device missed" stays
+meaningful for the offline decision.
+"""
+import logging
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import constants
+from .models import StateChange
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_CACHE_KEY = 'scan_schedule'
+HOURS_PER_WEEK = 7 * 24
+
+
+def hour_of_week(moment):
+    """Slot 0..167 of a datetime in local time (Monday 00:00 = 0)."""
+    local = timezone.localtime(moment)
+    return local.weekday() * 24 + local.hour
+
+
+def learn_arrival_windows(now=None):
+    """
+    Learn each user's usual arrival hours from StateChange history.
+
+    Returns:
+        dict[int, int]: user id -> 168-bit hour-of-week mask; the hour of
+        each regular arrival and the hour before it are set
+    """
+    now = now or timezone.now()
+    since = now - timedelta(days=constants.ADAPTIVE_ARRIVAL_LOOKBACK_DAYS)
+
+    arrivals = defaultdict(Counter)
+    rows = StateChange.objects.filter(
+        status=1, timestamp__gte=since
+    ).order_by().values_list('user_id', 'timestamp')
+    for user_id, timestamp in rows.iterator(chunk_size=2000):
+        arrivals[user_id][hour_of_week(timestamp)] += 1
+
+    windows = {}
+    for user_id, counts in arrivals.items():
+        mask = 0
+        for slot, count in counts.items():
+            if count >= constants.ADAPTIVE_ARRIVAL_MIN_COUNT:
+                mask |= 1 << slot
+                mask |= 1 << ((slot - 1) % HOURS_PER_WEEK)
+        windows[user_id] = mask
+
+    return windows
+
+
+class ScanScheduler:
+    """
+    Per-device schedule state, persisted in the cache between scans.
+
+    devices maps device id -> (next_due, last_change, online) with epoch
+    seconds as ints, which keeps the pickled state to a few bytes per
+    device.
+    """
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.devices = state.get('devices', {})
+        self.windows = state.get('windows', {})
+        self.windows_learned_at = state.get('windows_learned_at', 0)
+        self.probes = state.get('probes', 0)
+        self.baseline = state.get('baseline', 0.0)
+        self.last_tick = state.get('last_tick')
+        self.last_sweep = state.get('last_sweep', 0)
+
+    @classmethod
+    def load(cls):
+        scheduler = cls(cache.get(SCHEDULE_CACHE_KEY))
+        now = time.time()
+        age = now - scheduler.windows_learned_at
+        if age >= constants.ADAPTIVE_ARRIVAL_REFRESH_SECONDS:
+            scheduler.windows = learn_arrival_windows()
+            scheduler.windows_learned_at = int(now)
+        return scheduler
+
+    def save(self):
+        cache.set(SCHEDULE_CACHE_KEY, {
+            'devices': self.devices,
+            'windows': self.windows,
+            'windows_learned_at': self.windows_learned_at,
+            'probes': self.probes,
+            'baseline': self.baseline,
+            'last_tick': self.last_tick,
+            'last_sweep': self.last_sweep,
+        }, timeout=None)
+
+    def due_users(self, users, now=None):
+        """
+        Pick the users to probe this tick.
+
+        Args:
+            users: Users with prefetched devices
+
+        Returns:
+            list: Users with at least one due device
+        """
+        now = now if now is not None else time.time()
+        # Beat ticks drift slightly; treat anything due within half a tick as due
+        horizon = now + constants.ADAPTIVE_SCAN_TICK_SECONDS / 2
+        due = []
+        for user in users:
+            for device in user.devices.all():
+                entry = self.devices.get(device.id)
+                if entry is None or entry[0] <= horizon:
+                    due.append(user)
+                    break
+        return due
+
+    def sweep_due(self, now=None):
+        """Whether this tick should scan whole subnets instead of hosts."""
+        now = now if now is not None else time.time()
+        return now - self.last_sweep >= constants.ADAPTIVE_SWEEP_SECONDS
+
+    def swept(self, now=None):
+        self.last_sweep = int(now if now is not None else time.time())
+
+    def record(self, user, online, changed, missed=False, now=None):
+        """
+        Update the schedule of a user's devices after a probe.
+
+        Args:
+            missed: The user was missed without going offline yet; they are
+                probed again next tick
+        """
+        now = now if now is not None else time.time()
+        moment = datetime.fromtimestamp(now, tz=dt_timezone.utc)
+        slot = hour_of_week(moment)
+        in_window = bool(self.windows.get(user.id, 0) >> slot & 1)
+
+        for device in user.devices.all():
+            self.probes += 1
+            _, last_change, _ = self.devices.get(device.id, (0, None, online))
+            if changed:
+                last_change = int(now)
+
+            interval = (constants.ADAPTIVE_SCAN_TICK_SECONDS if missed
+                        else self._interval(online, last_change, in_window, moment))
+            self.devices[device.id] = (int(now + interval), last_change, online)
+
+    def _interval(self, online, last_change, in_window, moment):
+        now = moment.timestamp()
+        tick = constants.ADAPTIVE_SCAN_TICK_SECONDS
+        normal = constants.PING_INTERVAL_SECONDS
+        slow = normal * constants.ADAPTIVE_SLOW_FACTOR
+
+        since_change = now - last_change if last_change is not None else None
+        if since_change is not None and since_change < constants.ADAPTIVE_RECENT_SECONDS:
+            return tick
+        if not online and in_window:
+            return tick
+
+        local = timezone.localtime(moment)
+        if local.weekday() >= 5 or _is_night(local.hour):
+            return slow
+        if since_change is None or since_change >= constants.ADAPTIVE_STABLE_SECONDS:
+            return slow
+        return normal
+
+    def tick(self, users, now=None):
+        """
+        Start a scan tick: drop deleted devices and update the baseline.
+
+        The baseline is how many probes fixed PING_INTERVAL_SECONDS
+        scanning would have done over the same time.
+        """
+        now = now if now is not None else time.time()
+        device_ids = {device.id for user in users for device in user.devices.all()}
+        for device_id in set(self.devices) - device_ids:
+            del self.devices[device_id]
+
+        if self.last_tick is not None:
+            elapsed = min(now - self.last_tick, constants.PING_INTERVAL_SECONDS * 10)
+            self.baseline += len(device_ids) * elapsed / constants.PING_INTERVAL_SECONDS
+        self.last_tick = now
+
+    def metrics(self):
+        saved = max(0.0, self.baseline - self.probes)
+        ratio = saved / self.baseline if self.baseline else 0.0
+        return {
+            'probes': self.probes,
+            'fixed_interval_probes': int(self.baseline),
+            'probes_saved': int(saved),
+            'saved_ratio': round(ratio, 3),
+        }
+
+
+def _is_night(hour):
+    start = constants.ADAPTIVE_NIGHT_START_HOUR
+    end = constants.ADAPTIVE_NIGHT_END_HOUR
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
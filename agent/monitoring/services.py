@@ -1,25 +1,36 @@
 """
 Business logic services for monitoring app.
 """
+import logging
 import subprocess
 import platform
-import requests
+import time
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
+from . import constants, encoding
+from .constants import CLOUD_PAYLOAD_ENCODING, CLOUD_CAPABILITIES_TTL_SECONDS
+from .instrumentation import span, PHASE_HTTP
 
+logger = logging.getLogger(__name__)
 
-def ping_device(ip_address, timeout=4):
+
+def ping_device(ip_address, timeout=4, interface=None):
     """
     Ping a device using ARP and return success/failure.
 
     Args:
         ip_address: IP address to ping
         timeout: Timeout in seconds
+        interface: Interface to ping on (defaults to the one whose
+            configured subnet contains the IP)
 
     Returns:
         bool: True if device responded, False otherwise
     """
-    interface = settings.NETWORK_INTERFACE
+    if interface is None:
+        from .scanner import interface_for_ip
+        interface = interface_for_ip(ip_address)
     command = ['arping', '-c', '4', '-I',
                interface, '-w', str(timeout), ip_address]
 
@@ -48,77 +59,283 @@ def ping_device(ip_address, timeout=4):
         return (False, None)
 
 
-def send_heartbeat(devices_online):
+class CircuitOpenError(Exception):
+    """Raised instead of calling the cloud while the breaker is open."""
+
+
+class CloudCircuitBreaker:
+    """
+    Circuit breaker for cloud API calls, shared by all processes via the cache.
+
+    closed: calls go through; BREAKER_FAILURE_THRESHOLD consecutive
+        failures (connection errors, timeouts, 5xx) open the breaker
+    open: calls fail fast with CircuitOpenError for BREAKER_RESET_SECONDS
+    half-open: a single caller sends a probe request; success closes the
+        breaker, failure opens it again
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    OPENED_AT_KEY = 'cloud_breaker_opened_at'
+    FAILURES_KEY = 'cloud_breaker_failures'
+    PROBE_KEY = 'cloud_breaker_probe'
+    REJECTED_KEY = 'cloud_breaker_rejected'
+
+    def state(self):
+        opened_at = cache.get(self.OPENED_AT_KEY)
+        if opened_at is None:
+            return self.CLOSED
+        if time.time() - opened_at < constants.BREAKER_RESET_SECONDS:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def before_call(self):
+        """
+        Check whether a call may go out.
+
+        Returns:
+            bool: True if this call is the half-open probe
+
+        Raises:
+            CircuitOpenError: if the breaker is open or another caller
+                is already probing
+        """
+        state = self.state()
+        if state == self.CLOSED:
+            return False
+
+        if state == self.HALF_OPEN and cache.add(
+                self.PROBE_KEY, 1, timeout=constants.BREAKER_PROBE_TIMEOUT_SECONDS):
+            self._transition(self.OPEN, self.HALF_OPEN)
+            return True
+
+        self._incr(self.REJECTED_KEY)
+        raise CircuitOpenError(f"cloud circuit breaker is {state}")
+
+    def record_success(self, probe):
+        if probe:
+            cache.delete_many([self.OPENED_AT_KEY, self.PROBE_KEY])
+            self._transition(self.HALF_OPEN, self.CLOSED)
+        if cache.get(self.FAILURES_KEY):
+            cache.delete(self.FAILURES_KEY)
+
+    def record_failure(self, probe):
+        if probe:
+            cache.set(self.OPENED_AT_KEY, time.time(), timeout=None)
+            cache.delete(self.PROBE_KEY)
+            self._transition(self.HALF_OPEN, self.OPEN)
+            return
+
+        failures = self._incr(self.FAILURES_KEY)
+        if failures >= constants.BREAKER_FAILURE_THRESHOLD:
+            # add() so only one process performs the transition
+            if cache.add(self.OPENED_AT_KEY, time.time(), timeout=None):
+                cache.delete(self.FAILURES_KEY)
+                self._transition(self.CLOSED, self.OPEN, failures=failures)
+
+    def metrics(self):
+        return {
+            'state': self.state(),
+            'failures': cache.get(self.FAILURES_KEY) or 0,
+            'rejected': cache.get(self.REJECTED_KEY) or 0,
+        }
+
+    def log_metrics(self):
+        """Log state and counters, from the periodic cloud tasks."""
+        metrics = self.metrics()
+        logger.info("circuit_breaker " + ' '.join(
+            f'{key}={value}' for key, value in metrics.items()))
+        return metrics
+
+    def _incr(self, key):
+        try:
+            return cache.incr(key)
+        except ValueError:
+            if not cache.add(key, 1, timeout=None):
+                return cache.incr(key)
+            return 1
+
+    def _transition(self, old, new, **fields):
+        details = ' '.join(f'{key}={value}' for key, value in fields.items())
+        logger.warning(f"circuit_breaker transition={old}->{new} {details}".strip())
+        print(f"☁️  Cloud circuit breaker {old} -> {new}")
+
+
+cloud_breaker = CloudCircuitBreaker()
+
+CLOUD_CAPABILITIES_CACHE_KEY = 'cloud_capabilities'
+
+
+def get_cloud_capabilities():
+    """Encoding support last advertised by the cloud API."""
+    if CLOUD_PAYLOAD_ENCODING != 'auto':
+        return {'compact': False, 'coding': None}
+    return cache.get(CLOUD_CAPABILITIES_CACHE_KEY) or {'compact': False, 'coding': None}
+
+
+def remember_cloud_capabilities(response):
+    """
+    Store what the cloud advertises on a successful response.
+
+    Accept-Post lists the accepted request media types and Accept-Encoding
+    (RFC 7694) the accepted request content codings.
+    """
+    media_types = {
+        item.split(';')[0].strip().lower()
+        for item in response.headers.get('Accept-Post', '').split(',')
+    }
+    codings = {
+        item.split(';')[0].strip().lower()
+        for item in response.headers.get('Accept-Encoding', '').split(',')
+    }
+    capabilities = {
+        'compact': (encoding.msgpack is not None
+                    and encoding.COMPACT_MEDIA_TYPE in media_types),
+        'coding': next(
+            (c for c in encoding.available_codings() if c in codings), None),
+    }
+    cache.set(CLOUD_CAPABILITIES_CACHE_KEY, capabilities,
+              timeout=CLOUD_CAPABILITIES_TTL_SECONDS)
+
+
+def post_to_cloud(path, payload, compact=None, idempotency_key=None):
+    """
+    POST a payload to the cloud API in the best encoding it advertised.
+
+    Args:
+        path: API path, e.g. /api/heartbeat
+        payload: JSON payload
+        compact: Function building the compact form of the payload
+        idempotency_key: Sent as Idempotency-Key so the cloud can
+            recognise a retried upload it has already applied
+
+    Returns:
+        requests.Response: Successful response
+
+    Raises:
+        requests.RequestException: On connection errors or error status
+        CircuitOpenError: While the cloud circuit breaker is open
+    """
+    import requests
+
+    probe = cloud_breaker.before_call()
+
+    url = f"{settings.CLOUD_API_URL}{path}"
+    headers = {
+        'Authorization': f'Bearer {settings.AGENT_AUTH_TOKEN}'
+    }
+    if idempotency_key:
+        headers['Idempotency-Key'] = idempotency_key
+    capabilities = get_cloud_capabilities()
+
+    if capabilities['compact'] and compact:
+        body = encoding.encode_compact(compact(payload))
+        content_type = encoding.COMPACT_MEDIA_TYPE
+    else:
+        body = encoding.encode_json(payload)
+        content_type = encoding.JSON_MEDIA_TYPE
+
+    coding = capabilities['coding']
+    if coding:
+        body = encoding.compress(body, coding)
+        headers['Content-Encoding'] = coding
+
+    try:
+        with span(PHASE_HTTP):
+            response = requests.post(
+                url,
+                data=body,
+                headers={**headers, 'Content-Type': content_type},
+                timeout=constants.CLOUD_REQUEST_TIMEOUT_SECONDS
+            )
+
+            negotiated = coding or content_type != encoding.JSON_MEDIA_TYPE
+            if response.status_code == 415 and negotiated:
+                # No longer accepted - forget it and resend as plain JSON
+                cache.delete(CLOUD_CAPABILITIES_CACHE_KEY)
+                headers.pop('Content-Encoding', None)
+                response = requests.post(
+                    url, json=payload, headers=headers,
+                    timeout=constants.CLOUD_REQUEST_TIMEOUT_SECONDS)
+
+        response.raise_for_status()
+    except requests.RequestException as e:
+        status = e.response.status_code if e.response is not None else None
+        if status is None or status >= 500:
+            cloud_breaker.record_failure(probe)
+        else:
+            # The cloud answered; a 4xx is not an availability problem
+            cloud_breaker.record_success(probe)
+        raise
+
+    cloud_breaker.record_success(probe)
+    remember_cloud_capabilities(response)
+    return response
+
+
+def send_heartbeat(devices_online, site_id=None):
     """
     Send heartbeat to cloud API.
 
     Args:
         devices_online: List of dicts with employee info currently online
+        site_id: siteId the employees belong to (defaults to SITE_ID)
 
     Returns:
         bool: True if successful, False otherwise
     """
+    import requests
+
     payload = {
-        'siteId': settings.SITE_ID,
+        'siteId': site_id or settings.SITE_ID,
         'timestamp': timezone.now().isoformat(),
         'devicesOnline': devices_online
     }
 
-    headers = {
-        'Authorization': f'Bearer {settings.AGENT_AUTH_TOKEN}'
-    }
-
     try:
-        response = requests.post(
-            f"{settings.CLOUD_API_URL}/api/heartbeat",
-            json=payload,
-            headers=headers,
-            timeout=10
-        )
-        response.raise_for_status()
+        post_to_cloud('/api/heartbeat', payload, encoding.compact_heartbeat)
         print(
             f"Heartbeat sent successfully with {len(devices_online)} devices")
         return True
-    except requests.RequestException as e:
+    except (requests.RequestException, CircuitOpenError) as e:
         print(f"Error sending heartbeat: {e}")
         return False
 
 
-def send_hourly_summary(summaries, downtime_data=None):
+def send_hourly_summary(summaries, downtime_data=None, site_id=None):
     """
     Send hourly summary to cloud API.
 
     Args:
         summaries: List of dicts with hourly presence data
         downtime_data: Optional list of dicts with agent downtime info
+        site_id: siteId the summaries belong to (defaults to SITE_ID)
 
     Returns:
         bool: True if successful, False otherwise
     """
+    import requests
+
     payload = {
-        'siteId': settings.SITE_ID,
+        'siteId': site_id or settings.SITE_ID,
         'timestamp': timezone.now().isoformat(),
         'presenceData': summaries
     }
 
-    headers = {
-        'Authorization': f'Bearer {settings.AGENT_AUTH_TOKEN}'
-    }
-
     if downtime_data:
         payload['agentDowntimes'] = downtime_data
 
+    # Same records -> same key, whenever the upload is retried
+    idempotency_key = encoding.content_hash(
+        {key: value for key, value in payload.items() if key != 'timestamp'})
+
     try:
-        response = requests.post(
-            f"{settings.CLOUD_API_URL}/api/presence",
-            json=payload,
-            headers=headers,
-            timeout=10
-        )
-        response.raise_for_status()
+        post_to_cloud('/api/presence', payload, encoding.compact_presence,
+                      idempotency_key=idempotency_key)
         print(f"Hourly summary sent successfully: {len(summaries)} records")
         return True
-    except requests.RequestException as e:
+    except (requests.RequestException, CircuitOpenError) as e:
         print(f"Error sending hourly summary: {e}")
         return False
 
@@ -0,0 +1,22 @@
+"""
+Signal handlers for the monitoring app, connected in MonitoringConfig.ready().
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .device_index import bump_version
+from .models import Device, Site, User
+from .status import invalidate_status_snapshot
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=Site)
+def invalidate_device_index(sender, **kwargs):
+    """Registered devices, users or sites changed."""
+    bump_version()
+    # Names, sites and deleted users show up in /api/status
+    invalidate_status_snapshot()
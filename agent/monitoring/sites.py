@@ -0,0 +1,64 @@
+"""
+Sites served by one agent deployment.
+
+Every Site row has its own subnets, interfaces and cloud siteId. Users
+without a site belong to the default site built from the SITE_ID, SUBNET
+and NETWORK_INTERFACE settings, so single-site deployments need no Site
+rows at all. A Site row with the same site_id as SITE_ID replaces the
+default site's network settings.
+"""
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from .models import Site
+
+
+@dataclass(frozen=True)
+class SiteConfig:
+    """Network configuration of one site."""
+    site_id: str
+    interfaces: tuple
+    subnets: tuple
+
+
+def split_setting(value):
+    """Items of a comma-separated setting."""
+    return tuple(item.strip() for item in (value or '').split(',') if item.strip())
+
+
+def default_site():
+    """Site configured through the environment."""
+    return SiteConfig(
+        settings.SITE_ID,
+        split_setting(settings.NETWORK_INTERFACE),
+        split_setting(settings.SUBNET),
+    )
+
+
+def get_sites():
+    """
+    All sites to scan.
+
+    Returns:
+        list[SiteConfig]: The default site (if it has subnets) plus one
+        entry per Site row
+    """
+    sites = [
+        SiteConfig(
+            site.site_id,
+            split_setting(site.network_interface),
+            split_setting(site.subnet),
+        )
+        for site in Site.objects.all()
+    ]
+
+    default = default_site()
+    if default.subnets and all(site.site_id != default.site_id for site in sites):
+        sites.insert(0, default)
+    return sites
+
+
+def site_id_for(user):
+    """Cloud siteId of a user (select_related('site') to avoid a query)."""
+    return user.site.site_id if user.site_id else settings.SITE_ID
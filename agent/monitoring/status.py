@@ -0,0 +1,85 @@
+"""
+Precomputed presence snapshot served by the local /api/status endpoint.
+
+The snapshot is rebuilt when presence changes and kept in the cache with
+its ETag, so polling clients never touch the database. Admin edits of
+users, devices and sites drop it, and the next request rebuilds it.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import StateChange, User
+from .sites import site_id_for
+
+STATUS_CACHE_KEY = 'status_snapshot'
+
+
+def get_employee_status():
+    """
+    Current presence of every employee, grouped by site.
+
+    Returns:
+        dict[str, list[dict]]: siteId -> entries in the same shape as the
+        cloud heartbeat devicesOnline entries
+    """
+    users = User.objects.select_related('site').prefetch_related(
+        Prefetch(
+            'state_changes',
+            queryset=StateChange.objects.all()[:1],
+            to_attr='latest_state'
+        )
+    )
+
+    employees = {}
+    for user in users:
+        last_state = user.latest_state[0] if user.latest_state else None
+        employees.setdefault(site_id_for(user), []).append({
+            'employeeId': user.id,
+            'employeeName': user.fake_name,
+            'fakeName': user.fake_name,
+            'area': 'default',  # Hardcoded for MVP
+            'isPresent': bool(last_state and last_state.status == 1),
+            'lastSeen': last_state.timestamp.isoformat() if last_state else None
+        })
+    return employees
+
+
+def refresh_status_snapshot():
+    """Rebuild the snapshot from the database and store it in the cache."""
+    employees = [
+        {**employee, 'siteId': site_id}
+        for site_id, site_employees in get_employee_status().items()
+        for employee in site_employees
+    ]
+    body = json.dumps({
+        'siteId': settings.SITE_ID,
+        'generatedAt': timezone.now().isoformat(),
+        'employees': employees,
+    }).encode()
+
+    # Rebuilds without presence changes keep the same ETag
+    digest = hashlib.sha1(json.dumps(employees).encode()).hexdigest()
+    snapshot = {
+        'etag': f'"{digest}"',
+        'body': body,
+    }
+    cache.set(STATUS_CACHE_KEY, snapshot, timeout=None)
+    return snapshot
+
+
+def invalidate_status_snapshot():
+    """Drop the snapshot after employee data changed."""
+    cache.delete(STATUS_CACHE_KEY)
+
+
+def get_status_snapshot():
+    """Cached snapshot, rebuilt only if the cache lost it."""
+    snapshot = cache.get(STATUS_CACHE_KEY)
+    if snapshot is None:
+        snapshot = refresh_status_snapshot()
+    return snapshot
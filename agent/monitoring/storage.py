@@ -0,0 +1,28 @@
+"""
+Embedded storage mode: SQLite tuning.
+
+Django 5.0 has no init_command for SQLite, so the PRAGMAs are applied
+from the connection_created signal (connected in MonitoringConfig.ready).
+WAL lets the web server read while a task writes. The lock wait for
+concurrent writers is the sqlite3 connect timeout in DATABASES OPTIONS.
+"""
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    # Durable at checkpoints; a power cut loses at most the last commits
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-16000',       # 16 MB page cache
+    'PRAGMA mmap_size=134217728',     # 128 MB memory-mapped reads
+]
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
@@ -5,25 +5,61 @@ from celery import shared_task
 from django.utils import timezone
 from datetime import timedelta
 from .models import Device, StateChange, User, HourlySummary, SystemStatus, AgentDowntime
-from .services import send_heartbeat, send_hourly_summary
+from .services import send_heartbeat, send_hourly_summary, cloud_breaker
 from .constants import PING_LOCK_TIMEOUT_SECONDS, OFFLINE_FAILURE_COUNT
 from django.core.cache import cache
-from django.db.models import Prefetch
-from .services import get_normal_mac
-from config.settings import NETWORK_INTERFACE, SUBNET
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Subquery
+from .services import get_normal_mac, ping_device
+from .instrumentation import instrumented, span, PHASE_SCAN, PHASE_DB_READ, PHASE_DB_WRITE
+from .scanner import ScanResult, get_shards, scan_shards, restrict_shards, interface_for_ip
+from .sites import site_id_for
+from .device_index import bump_version, get_device_index
+from .presence import record_scan
+from .scheduler import ScanScheduler
+from .status import get_employee_status, refresh_status_snapshot
+from .events import publish_state_change
+from . import constants, encoding
+import ipaddress
 import time
-import subprocess
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
 
 user_failure_tracker = {}
+first_scan_reported = False
+# Runs a task in the background; the asyncio runtime replaces it with its
+# thread pool since it has no Celery broker
+task_dispatcher = None
+
+
+def dispatch(task):
+    """
+    Run a task outside the calling task, on its own queue.
+
+    The only supported way to start a task in the background: .delay()
+    needs the Celery runtime's broker. Never raises, since the periodic
+    schedule runs the task again anyway.
+    """
+    try:
+        if task_dispatcher is not None:
+            task_dispatcher(task)
+        else:
+            task.delay()
+    except Exception as e:
+        logger.warning(f"dispatch_failed task={task.name} error=\"{e}\"")
 
 
 def save_status(device, new_status):
-    StateChange.objects.create(
-        device=device,
-        user=device.user,
-        timestamp=timezone.now(),
-        status=new_status
-    )
+    with span(PHASE_DB_WRITE):
+        state_change = StateChange.objects.create(
+            device=device,
+            user=device.user,
+            timestamp=timezone.now(),
+            status=new_status
+        )
+    publish_state_change(state_change)
     if new_status == 1:
         print(f"{device.user.fake_name} came ONLINE 🟢")
     else:
@@ -31,54 +67,158 @@ def save_status(device, new_status):
 
 
 def get_mac_devices() -> set[str]:
-    mac_list = Device.objects.filter(
-        mac_address__isnull=False
-    ).exclude(
-        mac_address=''
-    ).values_list('mac_address', flat=True)
-
-    normalized = [get_normal_mac(m) for m in mac_list]
-
-    return set(normalized)
-
+    return get_device_index().mac_devices
+
+
+def get_latest_states():
+    """Latest StateChange of every user, by user id, in one query."""
+    latest = StateChange.objects.filter(
+        user=OuterRef('pk')).order_by('-timestamp').values('id')[:1]
+    ids = User.objects.annotate(latest_id=Subquery(latest)).values('latest_id')
+    return {change.user_id: change
+            for change in StateChange.objects.filter(id__in=ids)}
+
+
+def get_online_devices(mac_devices, hosts=None, shards=None) -> ScanResult:
+    """
+    Scan the shards of every site and return the merged result.
+    With hosts ((site, ip) pairs), only those addresses are probed when possible.
+    """
+    if shards is None:
+        shards = get_shards()
+    if hosts is not None:
+        shards = restrict_shards(shards, hosts) or shards
+    return scan_shards(shards, mac_devices)
+
+
+def report_first_scan():
+    """Log and store time-to-first-scan once after the agent booted."""
+    global first_scan_reported
+    if first_scan_reported:
+        return
+    first_scan_reported = True
 
-def get_online_devices(mac_devices) -> set[str]:
-    command = [
-        'arp-scan',
-        '--interface', NETWORK_INTERFACE,
-        '--retry', '4',
-        '--timeout', '500',
-        SUBNET
+    started_at = cache.get(constants.BOOT_STARTED_CACHE_KEY)
+    if started_at is None:
+        return
+    cache.delete(constants.BOOT_STARTED_CACHE_KEY)
+
+    elapsed = time.time() - started_at
+    cache.set(constants.TIME_TO_FIRST_SCAN_CACHE_KEY, elapsed, timeout=None)
+    print(f"🚀 First scan finished {elapsed:.2f}s after agent start")
+    logger.info(f"time_to_first_scan_ms={elapsed * 1000:.0f}")
+
+
+def update_device_addresses(index, addresses):
+    """
+    Store the address a device answered from when DHCP moved it.
+
+    Restricted scans and confirmation probes only probe Device.ip_address,
+    so it has to follow the device.
+
+    Args:
+        index: DeviceIndex of the scan
+        addresses: MAC -> IP seen by the scan
+    """
+    known = {device.id: device.ip_address
+             for devices in index.by_user.values() for device in devices}
+    moved = 0
+    for mac, ip in addresses.items():
+        device_id = index.by_mac[mac][0]
+        try:
+            ip = str(ipaddress.ip_address(ip))
+        except ValueError:
+            continue
+        if known.get(device_id) == ip:
+            continue
+        try:
+            with transaction.atomic():
+                Device.objects.filter(pk=device_id).update(ip_address=ip)
+        except IntegrityError:
+            # Another device is still registered with this address
+            logger.warning(f"device_address_conflict device={device_id} ip={ip}")
+            continue
+        logger.info(f"device_address_changed device={device_id} "
+                    f"old={known.get(device_id)} new={ip}")
+        moved += 1
+
+    if moved:
+        bump_version()
+
+
+def pick_confirm_users(missed):
+    """
+    Users missed by a scan that get confirmation probes.
+
+    Only users last seen online are probed, and at most
+    CONFIRM_MAX_DEVICES devices per scan; the others keep the plain
+    OFFLINE_FAILURE_COUNT debounce.
+
+    Args:
+        missed: (user, device, last_change) tuples of the scan
+    """
+    picked, budget = [], constants.CONFIRM_MAX_DEVICES
+    for user, _, last_change in missed:
+        if not (last_change and last_change.status == 1):
+            continue
+        count = len(user.devices.all())
+        if count <= budget:
+            picked.append(user)
+            budget -= count
+    return picked
+
+
+def confirm_missing_users(missing, shards):
+    """
+    Re-probe the devices of users missed by the scan with targeted arping.
+
+    Args:
+        missing: List of users (with prefetched devices and site)
+        shards: Shards of the scan, to pick each device's interface
+
+    Returns:
+        set[int]: Ids of the devices that answered
+    """
+    probes = [
+        (user.id, device,
+         interface_for_ip(device.ip_address, shards, site_id_for(user)))
+        for user in missing
+        for device in user.devices.all()
     ]
-
-    try:
-        result = subprocess.run(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=30,
-            text=True,
-            check=True
-        )
-        mac_adresses = set()
-
-        for line in result.stdout.split('\n'):
-            parts = line.lower().split()
-            for p in parts:
-                if p.count(':') == 5 and p in mac_devices:
-                    mac_adresses.add(p)
-
-        return mac_adresses
-
-    except subprocess.TimeoutExpired:
-        return set()
-    except subprocess.CalledProcessError as e:
-        return set()
-    except Exception as e:
+    if not probes:
         return set()
 
+    def probe(item):
+        _, device, interface = item
+        responded, mac = ping_device(
+            device.ip_address, timeout=constants.CONFIRM_PROBE_TIMEOUT_SECONDS,
+            interface=interface)
+        # An answer from another MAC means the IP now belongs to someone else
+        expected = get_normal_mac(device.mac_address)
+        if responded and (mac is None or expected is None or mac == expected):
+            return device.id
+        return None
+
+    start = time.perf_counter()
+    workers = max(1, min(constants.CONFIRM_MAX_WORKERS, len(probes)))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    futures = [pool.submit(probe, item) for item in probes]
+    # Probes still queued or running at the deadline count as unanswered
+    done, pending = wait(futures, timeout=constants.CONFIRM_DEADLINE_SECONDS)
+    pool.shutdown(wait=False, cancel_futures=True)
+    devices = {future.result() for future in done if future.result()}
+    duration = time.perf_counter() - start
+    responded = {user_id for user_id, device, _ in probes if device.id in devices}
+
+    logger.info(
+        f"confirm_probes users={len(missing)} probes={len(probes)} "
+        f"responded={len(responded)} absent={len(missing) - len(responded)} "
+        f"timed_out={len(pending)} duration_ms={duration * 1000:.0f}")
+    return devices
+
 
 @shared_task
+@instrumented
 def ping_all_devices():
     """Ping all active devices and update state changes.
     Uses Redis lock to prevent overlapping scans."""
@@ -97,40 +237,135 @@ def ping_all_devices():
     try:
         changes = 0
 
-        users = User.objects.prefetch_related(
-            Prefetch(
-                'state_changes',
-                queryset=StateChange.objects.all()[:1],
-                to_attr='latest_state'
-            )
-        ).all()
-        mac_devices = get_mac_devices()
-        online_devices = get_online_devices(mac_devices)
+        with span(PHASE_DB_READ):
+            # Users, devices and shards come from the in-memory index
+            index = get_device_index()
+            users = index.users
+            latest_states = get_latest_states()
+
+        scheduler = None
+        hosts = None
+        if constants.ADAPTIVE_SCAN_ENABLED:
+            scheduler = ScanScheduler.load()
+            scheduler.tick(users)
+            total = sum(len(user.devices.all()) for user in users)
+            users = scheduler.due_users(users)
+            due_ips = [(site_id_for(user), d.ip_address)
+                       for user in users for d in user.devices.all()]
+            if (len(due_ips) < total * constants.ADAPTIVE_FULL_SCAN_RATIO
+                    and not scheduler.sweep_due()):
+                hosts = due_ips
+
+        with span(PHASE_SCAN):
+            scan = get_online_devices(
+                index.mac_devices, hosts, index.shards) if users else ScanResult()
+        online_devices = {index.by_mac[mac][0] for mac in scan.macs}
+
+        if hosts is not None:
+            # Restricted scans only probe stored addresses. Before counting
+            # a miss for an online user, sweep their site's subnets in case
+            # the device got a new DHCP lease.
+            sweep_sites = {
+                site_id_for(user) for user in users
+                if user.id in latest_states and latest_states[user.id].status == 1
+                and not any(d.id in online_devices for d in user.devices.all())
+            }
+            if sweep_sites:
+                with span(PHASE_SCAN):
+                    scan.merge(scan_shards(
+                        [shard for shard in index.shards if shard.site in sweep_sites],
+                        index.mac_devices))
+                online_devices = {index.by_mac[mac][0] for mac in scan.macs}
+        elif scheduler:
+            scheduler.swept()
+
+        with span(PHASE_DB_WRITE):
+            update_device_addresses(index, scan.addresses)
+        missed = []
 
         for user in users:
+            devices = user.devices.all()
+            if not devices:
+                # Nothing to scan, and no device to attach a StateChange to
+                continue
+
             any_device_online = False
-            online_device = None
+            any_device_unknown = False
 
-            for device in user.devices.all():
-                is_online = get_normal_mac(
-                    device.mac_address) in online_devices
+            for device in devices:
+                is_online = device.id in online_devices
 
                 if is_online:
+                    # save_status() below attributes the arrival to this device
                     any_device_online = True
-                    online_device = device
                     break
 
-            last_change = user.latest_state[0] if user.latest_state else None
+                if not scan.covers(device.ip_address, site_id_for(user)):
+                    any_device_unknown = True
+
+            last_change = latest_states.get(user.id)
 
             if any_device_online:
                 user_failure_tracker.pop(user.id, None)
 
-                if not last_change or last_change.status == 0:
+                changed = not last_change or last_change.status == 0
+                if changed:
                     save_status(device, 1)
                     changes += 1
+                if scheduler:
+                    scheduler.record(user, online=True, changed=changed)
+
+            elif any_device_unknown:
+                # Shard covering this user failed - keep the previous state
+                continue
 
             else:
-                if last_change and last_change.status == 1:
+                # Offline transitions go to the device of the last change
+                device = next((d for d in devices
+                               if last_change and d.id == last_change.device_id),
+                              devices[0])
+                missed.append((user, device, last_change))
+
+        confirmed_devices = set()
+        confirm = pick_confirm_users(missed) if constants.CONFIRM_PROBES_ENABLED else []
+        if confirm:
+            with span(PHASE_SCAN):
+                confirmed_devices = confirm_missing_users(
+                    confirm, scan.scanned + scan.failed)
+        confirmed_online = {
+            user.id for user in confirm
+            if any(device.id in confirmed_devices for device in user.devices.all())
+        }
+        confirmed_missing = {user.id for user in confirm} - confirmed_online
+
+        for user, device, last_change in missed:
+            was_online = bool(last_change and last_change.status == 1)
+
+            if user.id in confirmed_online:
+                # Missed by the scan but answered arping (e.g. Wi-Fi sleep)
+                user_failure_tracker.pop(user.id, None)
+                if scheduler:
+                    scheduler.record(user, online=True, changed=False)
+                continue
+
+            changed = False
+            if user.id in confirmed_missing:
+                # Scan miss plus an unanswered targeted arping is stronger
+                # evidence than a scan miss alone, so it takes only
+                # CONFIRM_OFFLINE_FAILURE_COUNT misses (default 1: offline
+                # right away). Devices asleep on Wi-Fi usually answer arping.
+                print(f"All devices failed for {user.fake_name}, "
+                      f"no answer to arping either. 🟡")
+                failures = user_failure_tracker.get(user.id, 0) + 1
+                if failures >= constants.CONFIRM_OFFLINE_FAILURE_COUNT:
+                    save_status(device, 0)
+                    changes += 1
+                    changed = True
+                    user_failure_tracker.pop(user.id, None)
+                else:
+                    user_failure_tracker[user.id] = failures
+            else:
+                if was_online:
                     print(f"All devices failed for {user.fake_name}. 🟡")
                 if user.id not in user_failure_tracker:
                     user_failure_tracker[user.id] = 1
@@ -141,96 +376,126 @@ def ping_all_devices():
                         if last_change and last_change.status == 1:
                             save_status(device, 0)
                             changes += 1
+                            changed = True
                         user_failure_tracker.pop(user.id, None)
 
+            if scheduler:
+                # Still counts as online until the offline transition is written
+                scheduler.record(
+                    user, online=was_online and not changed, changed=changed,
+                    missed=was_online and not changed)
+
+        if constants.PRESENCE_BITMAP_ENABLED and index.users:
+            probed = {
+                device.id
+                for user in users for device in user.devices.all()
+                if scan.covers(device.ip_address, site_id_for(user))
+            }
+            with span(PHASE_DB_WRITE):
+                record_scan(index, online_devices | confirmed_devices, probed)
+
         if changes > 0:
-            send_heartbeat_to_cloud()
+            with span(PHASE_DB_READ):
+                refresh_status_snapshot()
+            # Cloud I/O runs on its own, so the scan cadence never waits on it
+            dispatch(send_heartbeat_to_cloud)
         duration = time.time() - start_time
         print(
             f"✅ Scan complete - {changes} changes detected in {duration:.2f}s")
+        if scan.failed:
+            print(f"⚠️  {len(scan.failed)}/{len(scan.failed) + len(scan.scanned)}"
+                  f" scan shards failed: {', '.join(map(str, scan.failed))}")
+        report_first_scan()
+        if scheduler:
+            scheduler.save()
+            metrics = scheduler.metrics()
+            logger.info(
+                f"adaptive_scan due_users={len(users)} "
+                + ' '.join(f'{key}={value}' for key, value in metrics.items()))
     finally:
         cache.delete(LOCK_KEY)
         # print("🏁 Lock released")
 
 
 @shared_task
+@instrumented
 def send_heartbeat_to_cloud():
     """Send current online status to cloud."""
-    all_employees = []
-
-    for user in User.objects.all():
-        last_state = user.state_changes.first()
+    with span(PHASE_DB_READ):
+        sites = get_employee_status()
 
-        all_employees.append({
-            'employeeId': user.id,
-            'employeeName': user.fake_name,
-            'fakeName': user.fake_name,
-            'area': 'default',  # Hardcoded for MVP
-            'isPresent': user.is_online(),
-            'lastSeen': last_state.timestamp.isoformat() if last_state else None
-        })
+    for site_id, all_employees in sites.items():
+        if send_heartbeat(all_employees, site_id):
+            online_count = sum(1 for emp in all_employees if emp['isPresent'])
+            print(f"💓 Heartbeat {site_id}: "
+                  f"{online_count}/{len(all_employees)} online")
 
-    if send_heartbeat(all_employees):
-        online_count = sum(1 for emp in all_employees if emp['isPresent'])
-        print(f"💓 Heartbeat: {online_count}/{len(all_employees)} online")
+    cloud_breaker.log_metrics()
 
 
 @shared_task
+@instrumented
 def send_hourly_summary_to_cloud():
     """Calculate hourly presence span and send to cloud"""
     end_time = timezone.now().replace(minute=0, second=0, microsecond=0)
     start_time = end_time - timedelta(hours=1)
 
     summaries = []
+    skipped = 0
 
-    for user in User.objects.all():
-        changes = user.state_changes.filter(
-            timestamp__gte=start_time,
-            timestamp__lt=end_time
-        ).order_by('timestamp')
+    for user in User.objects.select_related('site'):
+        with span(PHASE_DB_READ):
+            changes = list(user.state_changes.filter(
+                timestamp__gte=start_time,
+                timestamp__lt=end_time
+            ).order_by('timestamp'))
 
-        initial_state = user.state_changes.filter(
-            timestamp__lt=start_time
-        ).order_by('-timestamp').first()
+            initial_state = user.state_changes.filter(
+                timestamp__lt=start_time
+            ).order_by('-timestamp').first()
 
         was_online_at_start = initial_state and initial_state.status == 1
 
-        if not changes.exists():
+        if not changes:
             if was_online_at_start:
                 first_seen = start_time
                 last_seen = end_time
             else:
                 continue
         else:
-            first_change = changes.first()
-            last_change = changes.last()
+            first_change = changes[0]
+            last_change = changes[-1]
             first_seen = start_time if was_online_at_start else first_change.timestamp
             last_seen = end_time if last_change.status == 1 else last_change.timestamp
 
         minutes_present = (last_seen - first_seen).total_seconds() / 60
 
-        summary_obj, created = HourlySummary.objects.update_or_create(
-            user=user,
-            hour=start_time,
-            defaults={
-                'first_seen': first_seen,
-                'last_seen': last_seen,
-                'minutes_online': int(minutes_present),
-                'synced': False
-            }
-        )
+        with span(PHASE_DB_READ):
+            summary_obj = HourlySummary.objects.filter(
+                user=user, hour=start_time).first()
+        if summary_obj is None:
+            summary_obj = HourlySummary(user=user, hour=start_time)
+
+        summary_obj.first_seen = first_seen
+        summary_obj.last_seen = last_seen
+        summary_obj.minutes_online = int(minutes_present)
+        payload = summary_obj.to_payload()
+        content_hash = encoding.content_hash(payload)
+
+        if summary_obj.pk is None or summary_obj.content_hash != content_hash:
+            summary_obj.content_hash = content_hash
+            summary_obj.synced = summary_obj.synced_hash == content_hash
+            with span(PHASE_DB_WRITE):
+                summary_obj.save()
+        # else: recomputed to identical values, nothing to write
 
-        payload = {
-            'employeeId': user.id,
-            'employeeName': user.fake_name,
-            'fakeName': user.fake_name,
-            'date': start_time.date().isoformat(),
-            'hour': start_time.hour,
-            'firstSeen': first_seen.time().isoformat(),
-            'lastSeen': last_seen.time().isoformat(),
-            'minutesOnline': int(minutes_present)
-        }
-        summaries.append((payload, summary_obj))
+        if summary_obj.synced_hash == content_hash:
+            skipped += 1
+            continue
+        summaries.append((payload, summary_obj, site_id_for(user)))
+
+    if skipped:
+        print(f"{skipped} hourly summaries unchanged since last sync")
 
     if summaries:
         unsynced_downtimes = AgentDowntime.objects.filter(synced=False)
@@ -242,55 +507,69 @@ def send_hourly_summary_to_cloud():
                 'downtimeEnd': dt.downtime_end.isoformat()
             } for dt in unsynced_downtimes]
 
-        for payload, summary_obj in summaries:
-            success = send_hourly_summary(
-                [payload], downtime_data if downtime_data else None)
+        # The agent was down for every site, so each site gets the downtimes
+        downtime_pending = {site_id for _, _, site_id in summaries}
+
+        for payload, summary_obj, site_id in summaries:
+            attach = downtime_data if site_id in downtime_pending else None
+            success = send_hourly_summary([payload], attach, site_id)
             if success:
-                summary_obj.synced = True
-                summary_obj.save()
+                with span(PHASE_DB_WRITE):
+                    summary_obj.synced = True
+                    summary_obj.synced_hash = summary_obj.content_hash
+                    summary_obj.save(update_fields=['synced', 'synced_hash'])
 
-                if downtime_data:
-                    unsynced_downtimes.update(synced=True)
-                    downtime_data = None
+                    if attach:
+                        downtime_pending.discard(site_id)
+                        if not downtime_pending:
+                            unsynced_downtimes.update(synced=True)
+                            downtime_data = None
 
 
 @shared_task
+@instrumented
 def retry_unsynced_summaries():
     """Retry sending unsynced hourly summaries to cloud (newest first)."""
+    cloud_breaker.log_metrics()
 
-    unsynced = HourlySummary.objects.filter(synced=False).order_by('-hour')
+    with span(PHASE_DB_READ):
+        unsynced = list(HourlySummary.objects.filter(
+            synced=False).select_related('user__site').order_by('-hour'))
 
-    if not unsynced.exists():
+    if not unsynced:
         print("no unsyncend summaries to retry")
         return
 
-    print(f"retrying {unsynced.count()} unsynced summaries...")
+    if cloud_breaker.state() == cloud_breaker.OPEN:
+        print(f"cloud unavailable, skipping retry of {len(unsynced)} summaries")
+        return
+
+    print(f"retrying {len(unsynced)} unsynced summaries...")
 
     for summary in unsynced:
-        payload = {
-            'employeeId': summary.user.id,
-            'employeeName': summary.user.fake_name,
-            'fakeName': summary.user.fake_name,
-            'date': summary.hour.date().isoformat(),
-            'hour': summary.hour.hour,
-            'firstSeen': summary.first_seen.time().isoformat(),
-            'lastSeen': summary.last_seen.time().isoformat(),
-            'minutesOnline': summary.minutes_online
-        }
+        payload = summary.to_payload()
 
-        success = send_hourly_summary([payload])
+        success = send_hourly_summary([payload], site_id=site_id_for(summary.user))
         if success:
-            summary.synced = True
-            summary.save()
+            with span(PHASE_DB_WRITE):
+                summary.synced = True
+                summary.content_hash = encoding.content_hash(payload)
+                summary.synced_hash = summary.content_hash
+                summary.save(update_fields=['synced', 'content_hash', 'synced_hash'])
             print(f"✓ Synced summary for", end=" ")
             print(f"{summary.user.fake_name} at {summary.hour}")
         else:
             print(f"✗ Failed to sync summary for", end=" ")
             print(f"{summary.user.fake_name} at {summary.hour}")
+            if cloud_breaker.state() != cloud_breaker.CLOSED:
+                print("cloud unavailable, stopping retry")
+                break
 
 
 @shared_task
+@instrumented
 def update_system_heartbeat():
     """Update system heartbeat to track app health."""
-    system = SystemStatus.get_instance()
-    system.save()  # This updates updated_at automatically
+    with span(PHASE_DB_WRITE):
+        system = SystemStatus.get_instance()
+        system.save()  # This updates updated_at automatically
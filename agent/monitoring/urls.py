@@ -0,0 +1,13 @@
+"""
+URL configuration for the monitoring app local API.
+"""
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path('status', views.status, name='status'),
+    path('events', views.events, name='events'),
+    path('export', views.export, name='export'),
+    path('presence', views.presence, name='presence'),
+]
@@ -0,0 +1,129 @@
+"""
+Read-only local API for the monitoring app.
+"""
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import (
+    HttpResponse, HttpResponseBadRequest, HttpResponseNotModified, JsonResponse,
+    StreamingHttpResponse)
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_GET
+
+from .constants import EXPORT_STREAM_BATCH, STATUS_MAX_AGE_SECONDS
+from .events import stream_events
+from .export import FORMATS, attendance_rows, parse_date_range, render
+from .presence import heatmap, presence_minutes
+from .status import get_status_snapshot
+
+
+@require_GET
+def status(request):
+    """Presence and last-seen time of every employee, from the snapshot."""
+    snapshot = get_status_snapshot()
+    etag = snapshot['etag']
+    cache_control = f'max-age={STATUS_MAX_AGE_SECONDS}'
+
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(snapshot['body'], content_type='application/json')
+
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+@require_GET
+async def events(request):
+    """Server-sent events stream of presence changes (ASGI only)."""
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('lastEventId')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    response = StreamingHttpResponse(
+        stream_events(last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def _stream_batches(lines):
+    """
+    Serve a blocking line generator to the ASGI server batch by batch.
+
+    A plain generator would be read to the end before the first byte is
+    sent under ASGI. thread_sensitive keeps every batch on the same thread,
+    and so on the same database connection and server-side cursor.
+    """
+    next_batch = sync_to_async(
+        lambda: ''.join(islice(lines, EXPORT_STREAM_BATCH)), thread_sensitive=True)
+    while True:
+        batch = await next_batch()
+        if not batch:
+            break
+        yield batch
+
+
+@require_GET
+@staff_member_required
+def export(request):
+    """
+    Daily attendance as CSV or NDJSON, streamed (admin staff only).
+
+    Query parameters: start and end (YYYY-MM-DD, inclusive), optional
+    users (comma-separated ids) and format (csv or ndjson, default csv).
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in FORMATS:
+        return HttpResponseBadRequest(f"format must be one of {', '.join(FORMATS)}")
+
+    try:
+        start_date, end_date = parse_date_range(
+            request.GET.get('start', ''), request.GET.get('end', ''))
+        users = request.GET.get('users')
+        user_ids = [int(u) for u in users.split(',') if u.strip()] if users else None
+    except ValueError as e:
+        return HttpResponseBadRequest(f"Invalid parameters: {e}")
+
+    lines = render(attendance_rows(start_date, end_date, user_ids), fmt)
+    response = StreamingHttpResponse(_stream_batches(lines), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = (
+        f'attachment; filename="attendance-{start_date}-{end_date}.{fmt}"')
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_GET
+@staff_member_required
+def presence(request):
+    """
+    Minutes present per period, and optionally a weekday x hour heatmap,
+    from the presence bitmaps (admin staff only).
+
+    Query parameters: user (id), start and end (YYYY-MM-DD, inclusive),
+    optional period (day, week or month, default day) and heatmap=1.
+    """
+    period = request.GET.get('period', 'day')
+    if period not in ('day', 'week', 'month'):
+        return HttpResponseBadRequest("period must be one of day, week, month")
+
+    try:
+        user_id = int(request.GET.get('user', ''))
+        start_date, end_date = parse_date_range(
+            request.GET.get('start', ''), request.GET.get('end', ''))
+    except ValueError as e:
+        return HttpResponseBadRequest(f"Invalid parameters: {e}")
+
+    data = {
+        'employeeId': user_id,
+        'period': period,
+        'minutes': presence_minutes(user_id, start_date, end_date, period),
+    }
+    if request.GET.get('heatmap') == '1':
+        data['heatmap'] = heatmap(user_id, start_date, end_date)
+    return JsonResponse(data)